@@ -35,6 +35,8 @@ try:
     elif "安装" in message and "成功" in message:
         print(f"\n{message}")
         print("依赖已安装，正在启动应用...\n")
+    elif "后台" in message:
+        print(f"\n{message}")
 except ImportError as e:
     # dependency_checker 模块本身导入失败，继续尝试启动
     print(f"警告: 依赖检查模块加载失败: {e}")
@@ -21,6 +21,7 @@ import sys
 from typing import Optional
 
 from PySide6.QtCore import QTimer, QObject
+from PySide6.QtGui import QPixmapCache
 from PySide6.QtWidgets import QApplication
 from qasync import QEventLoop, asyncSlot
 
@@ -190,6 +191,8 @@ class DesktopClientApp(QObject):
             self._app = QApplication(sys.argv)
         if self._app:
             self._app.setQuitOnLastWindowClosed(False)
+        # 聊天图片、缩略图和头像共用 QPixmapCache，默认 10 MB 不够用
+        QPixmapCache.setCacheLimit(50 * 1024)
 
         # 2. 启用 QSS 主题系统并从配置加载主题
         logger.info("启用 QSS 主题系统")
@@ -790,6 +793,11 @@ class DesktopClientApp(QObject):
         if self._hotkey_manager:
             self._hotkey_manager.cleanup()
 
+        # 聊天记录的保存是延迟合并的，退出前同步写入一次
+        chat_history_manager = get_chat_history_manager()
+        if chat_history_manager.has_unsaved_changes():
+            chat_history_manager.save_to_file_sync()
+
         asyncio.ensure_future(self._bridge.disconnect_server())
 
         if self._app:
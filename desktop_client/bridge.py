@@ -142,7 +142,7 @@ class MessageBridge(QObject):
 
     def _generate_request_id(self) -> str:
         """生成唯一的请求ID"""
-        return f"req_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+        return f"req_{uuid.uuid4().hex[:12]}"
 
     async def send_input(self, msg: InputMessage):
         """发送输入消息（使用请求锁确保顺序处理）"""
@@ -181,6 +181,9 @@ class MessageBridge(QObject):
             self._current_request_id = request_id
             logger.debug(f"发送请求: {request_id}, 类型: {msg.msg_type}")
 
+            # 每个请求只构造一次基础元数据，供所有 SSE 事件复用
+            base_metadata = {"request_id": request_id}
+
             # 根据消息类型发送
             streaming = self.config.server.enable_streaming
 
@@ -192,7 +195,7 @@ class MessageBridge(QObject):
                     enable_streaming=streaming,
                 ):
                     logger.debug(f"收到 SSE 事件: type={event.event_type}")
-                    self._handle_sse_event(event, session_id, request_id)
+                    self._handle_sse_event(event, session_id, base_metadata)
                     await asyncio.sleep(0)
 
             elif msg.msg_type in ("image", "screenshot"):
@@ -202,7 +205,7 @@ class MessageBridge(QObject):
                     text=msg.metadata.get("text", ""),
                     enable_streaming=streaming,
                 ):
-                    self._handle_sse_event(event, session_id, request_id)
+                    self._handle_sse_event(event, session_id, base_metadata)
                     await asyncio.sleep(0)
 
             elif msg.msg_type == "voice":
@@ -211,7 +214,7 @@ class MessageBridge(QObject):
                     audio_path=msg.content,
                     enable_streaming=streaming,
                 ):
-                    self._handle_sse_event(event, session_id, request_id)
+                    self._handle_sse_event(event, session_id, base_metadata)
                     await asyncio.sleep(0)
 
             elif msg.msg_type == "file":
@@ -221,7 +224,7 @@ class MessageBridge(QObject):
                     text=msg.metadata.get("text", ""),
                     enable_streaming=streaming,
                 ):
-                    self._handle_sse_event(event, session_id, request_id)
+                    self._handle_sse_event(event, session_id, base_metadata)
                     await asyncio.sleep(0)
 
             logger.debug(f"请求完成: {request_id}")
@@ -240,11 +243,22 @@ class MessageBridge(QObject):
             self._current_request_id = None
 
     def _handle_sse_event(
-        self, event: SSEEvent, session_id: str, request_id: Optional[str] = None
+        self,
+        event: SSEEvent,
+        session_id: str,
+        base_metadata: Optional[dict] = None,
     ):
-        """处理 SSE 事件并发射信号"""
-        # 将请求ID添加到元数据中，用于追踪
-        base_metadata = {"request_id": request_id} if request_id else {}
+        """
+        处理 SSE 事件并发射信号
+
+        Args:
+            event: SSE 事件
+            session_id: 会话ID
+            base_metadata: 请求级基础元数据（包含 request_id，用于追踪），
+                由调用方每个请求构造一次；无需附加字段的事件直接复用
+        """
+        if base_metadata is None:
+            base_metadata = {}
 
         if event.event_type == "plain":
             # 检查内容是否为空，避免发送空消息
@@ -266,7 +280,7 @@ class MessageBridge(QObject):
                 # 尝试提取函数调用结果中的 result 字段
                 content = self._extract_function_result(content)
 
-            metadata = {**base_metadata, "chain_type": event.chain_type}
+            metadata = base_metadata | {"chain_type": event.chain_type}
             self.message_received.emit(
                 OutputMessage(
                     msg_type="text",
@@ -279,7 +293,7 @@ class MessageBridge(QObject):
 
         elif event.event_type == "image":
             filename = event.data.replace("[IMAGE]", "")
-            metadata = {**base_metadata, "filename": filename}
+            metadata = base_metadata | {"filename": filename}
             self.message_received.emit(
                 OutputMessage(
                     msg_type="image",
@@ -291,7 +305,7 @@ class MessageBridge(QObject):
 
         elif event.event_type == "record":
             filename = event.data.replace("[RECORD]", "")
-            metadata = {**base_metadata, "filename": filename}
+            metadata = base_metadata | {"filename": filename}
             self.message_received.emit(
                 OutputMessage(
                     msg_type="voice",
@@ -303,7 +317,7 @@ class MessageBridge(QObject):
 
         elif event.event_type == "file":
             filename = event.data.replace("[FILE]", "")
-            metadata = {**base_metadata, "filename": filename}
+            metadata = base_metadata | {"filename": filename}
             self.message_received.emit(
                 OutputMessage(
                     msg_type="file",
@@ -325,7 +339,7 @@ class MessageBridge(QObject):
             )
 
         elif event.event_type == "break":
-            metadata = {**base_metadata, "break": True}
+            metadata = base_metadata | {"break": True}
             self.message_received.emit(
                 OutputMessage(
                     msg_type="end",
@@ -339,8 +353,7 @@ class MessageBridge(QObject):
         elif event.event_type == "message_saved":
             raw = event.raw or {}
             data = raw.get("data", {})
-            metadata = {
-                **base_metadata,
+            metadata = base_metadata | {
                 "message_id": data.get("id"),
                 "created_at": data.get("created_at"),
             }
@@ -440,19 +453,35 @@ class MessageBridge(QObject):
         url: Optional[str] = None,
         username: Optional[str] = None,
         password: Optional[str] = None,
-    ):
-        """更新服务器配置"""
+    ) -> bool:
+        """
+        更新服务器配置
+
+        以 API 客户端当前使用的凭据为准进行比较（设置窗口可能已提前写入 config），
+        url/username/password 均未变化时保留现有 token 和连接状态。
+
+        Returns:
+            连接凭据是否发生变化（即是否需要重连）
+        """
+        client = self.api_client
+        old_credentials = (client.server_url, client.username, client.password)
+
         if url:
             self.config.server.url = url
-            self.api_client.server_url = url
+            client.server_url = url.rstrip("/")
         if username:
             self.config.server.username = username
-            self.api_client.username = username
+            client.username = username
         if password:
             self.config.server.password = password
-            self.api_client.password = password
+            client.password = password
+
+        # 凭据未变化，保留现有 token 和连接
+        if (client.server_url, client.username, client.password) == old_credentials:
+            return False
 
         # 清除旧 token 并重置状态
         self.config.server.token = None
-        self.api_client.token = None
-        self.api_client.state = ConnectionState.DISCONNECTED
+        client.token = None
+        client.state = ConnectionState.DISCONNECTED
+        return True
@@ -11,6 +11,7 @@
 - 更新配置更新
 """
 
+import json
 import logging
 from typing import TYPE_CHECKING, Optional, Any, Dict
 
@@ -60,6 +61,9 @@ class SettingsController(QObject):
         self._chat_history_manager = chat_history_manager
         self._update_service = update_service
 
+        # 上一次成功应用后的设置与配置状态哈希，用于跳过内容未变化的重复提交
+        self._last_settings_hash: Optional[int] = None
+
     def set_bridge(self, bridge: "MessageBridge") -> None:
         """设置消息桥接"""
         self._bridge = bridge
@@ -87,6 +91,13 @@ class SettingsController(QObject):
         Args:
             settings: 设置字典
         """
+        # 设置内容与上次应用的完全一致、且配置期间未被其他入口修改时
+        # 直接跳过，避免重复保存和重连
+        settings_json = json.dumps(settings, sort_keys=True, default=str)
+        if hash((settings_json, repr(self._config))) == self._last_settings_hash:
+            logger.debug("设置未变化，跳过处理")
+            return
+
         need_reconnect = False
 
         # 更新服务器配置
@@ -112,6 +123,8 @@ class SettingsController(QObject):
 
         # 保存配置到文件
         self._save_config()
+        # 记录应用后的配置状态：悬浮球菜单等入口修改配置后，哈希随之失效
+        self._last_settings_hash = hash((settings_json, repr(self._config)))
 
         # 如果需要重连，发射信号
         if need_reconnect:
@@ -132,20 +145,27 @@ class SettingsController(QObject):
 
         if "url" in server or "username" in server or "password" in server:
             if self._bridge:
-                self._bridge.update_server_config(
+                # 由 bridge 对比客户端实际使用的凭据，未变化时无需重连
+                need_reconnect = self._bridge.update_server_config(
                     url=server.get("url"),
                     username=server.get("username"),
                     password=server.get("password"),
                 )
+            else:
+                need_reconnect = any(
+                    key in server and server[key] != getattr(self._config.server, key)
+                    for key in ("url", "username", "password")
+                )
             if "url" in server:
                 self._config.server.url = server["url"]
             if "username" in server:
                 self._config.server.username = server["username"]
             if "password" in server:
                 self._config.server.password = server["password"]
-            if "enable_streaming" in server:
-                self._config.server.enable_streaming = server["enable_streaming"]
-            need_reconnect = True
+
+        # 流式开关在发送时读取，无需重连
+        if "enable_streaming" in server:
+            self._config.server.enable_streaming = server["enable_streaming"]
 
         return need_reconnect
 
@@ -4,61 +4,228 @@
 在应用启动时检测必要依赖是否已安装，如果缺失则自动安装。
 """
 
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import site
 import subprocess
 import sys
+import tempfile
+import threading
 import importlib
+import importlib.metadata
 import importlib.util
-from typing import List, Tuple, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, List, NamedTuple, Tuple, Optional
 from pathlib import Path
 
 
-# 核心依赖列表：(模块名, pip包名, 是否必需)
-# 模块名用于 import 检测，pip包名用于安装
-CORE_DEPENDENCIES = [
+class Dependency(NamedTuple):
+    """依赖项
+
+    module_name 用于 import 检测，pip_name 用于安装；
+    has_subdeps 为 False 的包没有运行时依赖，单独安装时跳过依赖解析
+    """
+
+    module_name: str
+    pip_name: str
+    required: bool
+    has_subdeps: bool = True
+
+
+# 核心依赖列表
+CORE_DEPENDENCIES: Tuple[Dependency, ...] = (
     # GUI 框架
-    ("PySide6", "PySide6>=6.5.0", True),
-    ("qasync", "qasync>=0.27.1", True),
+    Dependency("PySide6", "PySide6>=6.5.0", True),
+    Dependency("qasync", "qasync>=0.27.1", True, has_subdeps=False),
     # HTTP 客户端
-    ("httpx", "httpx[http2]>=0.24.0", True),
-    ("httpx_sse", "httpx-sse>=0.4.0", True),
+    Dependency("httpx", "httpx[http2]>=0.24.0", True),
+    Dependency("httpx_sse", "httpx-sse>=0.4.0", True, has_subdeps=False),
     # WebSocket
-    ("websockets", "websockets>=11.0.0", True),
+    Dependency("websockets", "websockets>=11.0.0", True, has_subdeps=False),
     # 截图
-    ("PIL", "Pillow>=9.0.0", True),
-    ("mss", "mss>=9.0.0", True),
+    Dependency("PIL", "Pillow>=9.0.0", True, has_subdeps=False),
+    Dependency("mss", "mss>=9.0.0", True, has_subdeps=False),
     # 系统信息
-    ("psutil", "psutil>=5.9.0", True),
+    Dependency("psutil", "psutil>=5.9.0", True, has_subdeps=False),
     # 全局快捷键
-    ("pynput", "pynput>=1.7.0", False),
+    Dependency("pynput", "pynput>=1.7.0", False),
     # 配置管理
-    ("pydantic", "pydantic>=2.0.0", True),
+    Dependency("pydantic", "pydantic>=2.0.0", True),
     # 工具
-    ("dateutil", "python-dateutil>=2.8.0", True),
+    Dependency("dateutil", "python-dateutil>=2.8.0", True),
     # Markdown
-    ("markdown", "markdown>=3.4.0", True),
-    ("pygments", "pygments>=2.15.0", True),
-]
+    Dependency("markdown", "markdown>=3.4.0", True, has_subdeps=False),
+    Dependency("pygments", "pygments>=2.15.0", True, has_subdeps=False),
+)
 
 # Windows 专用依赖
-WINDOWS_DEPENDENCIES = [
-    ("win32api", "pywin32>=306", False),
-]
+WINDOWS_DEPENDENCIES: Tuple[Dependency, ...] = (
+    Dependency("win32api", "pywin32>=306", False, has_subdeps=False),
+)
 
 # macOS 专用依赖
-MACOS_DEPENDENCIES = [
-    ("objc", "pyobjc-framework-Cocoa>=9.0", False),
-]
+MACOS_DEPENDENCIES: Tuple[Dependency, ...] = (
+    Dependency("objc", "pyobjc-framework-Cocoa>=9.0", False),
+)
+
+# 单个包的安装超时（秒），批量安装按包数累加
+PIP_TIMEOUT = 300
+
+# 并发下载的最大线程数
+DOWNLOAD_WORKERS = 8
+
+# 并发检查模块的最大线程数
+CHECK_WORKERS = 8
+
+# 依赖检查结果缓存目录
+CACHE_DIR = Path.home() / ".cache" / "astrbot"
+
+# 打包时生成的依赖锁文件，记录打包环境中已包含的模块
+LOCK_FILE = Path(__file__).with_name("deps.lock.json")
+
+# 打包环境中磁盘上存在的顶层模块名，由 _frozen_modules() 惰性填充
+_FROZEN_MODULES: Optional[set] = None
+
+# 只安装预编译 wheel 失败后，允许回退到源码构建的包（规范化名称）
+# 这些包（或其依赖，如 Linux 上 pynput 依赖的 evdev）在部分平台上只有 sdist
+SDIST_FALLBACK_PACKAGES = {"pillow", "psutil", "pynput"}
+
+# pip 子进程的环境变量：跳过每次启动时的版本检查请求、禁止交互提示、
+# 关闭进度条重绘（输出按行转发，进度条只会产生大量无用输出）
+PIP_ENV = {
+    "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+    "PIP_NO_INPUT": "1",
+    "PIP_PROGRESS_BAR": "off",
+}
+
+
+def _normalize_name(requirement: str) -> str:
+    """从依赖说明中提取规范化的包名
+
+    去掉 extras 与版本约束，并按 PEP 503 规范化，
+    例如 "httpx[http2]>=0.24.0" -> "httpx"，"Pillow>=9.0.0" -> "pillow"。
+    """
+    name = re.split(r"[\[<>=!~;\s(]", requirement.strip(), maxsplit=1)[0]
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _no_deps_args(pip_name: str) -> List[str]:
+    """没有运行时依赖的已知包，单独下载/安装时跳过依赖解析"""
+    name = _normalize_name(pip_name)
+    for dep in (*CORE_DEPENDENCIES, *WINDOWS_DEPENDENCIES, *MACOS_DEPENDENCIES):
+        if _normalize_name(dep.pip_name) == name:
+            return [] if dep.has_subdeps else ["--no-deps"]
+    return []
+
+
+def _run_pip(
+    args: List[str],
+    line_callback: Optional[Callable[[str], None]] = None,
+    timeout: float = PIP_TIMEOUT,
+) -> bool:
+    """运行 pip 子进程，逐行转发输出
+
+    Args:
+        args: pip 子命令及参数（不含 "python -m pip"）
+        line_callback: 输出行回调，接收去掉行尾的文本
+        timeout: 超时时间（秒），超时后终止进程
+
+    Returns:
+        bool: pip 是否成功退出
+    """
+    cmd = [sys.executable, "-m", "pip", *args]
+    # 用户显式设置的同名环境变量优先
+    env = {**PIP_ENV, **os.environ}
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+    except Exception:
+        return False
+
+    # 超时后终止进程，读取循环会随管道关闭而结束
+    killer = threading.Timer(timeout, proc.kill)
+    killer.daemon = True
+    killer.start()
+    try:
+        for line in proc.stdout:
+            if line_callback:
+                line_callback(line.rstrip())
+        return proc.wait() == 0
+    except Exception:
+        proc.kill()
+        return False
+    finally:
+        killer.cancel()
+        proc.stdout.close()
+
+
+def _pip_version() -> Tuple[int, ...]:
+    """获取当前解释器中 pip 的版本号，无法获取时返回 (0,)"""
+    try:
+        version = importlib.metadata.version("pip")
+    except importlib.metadata.PackageNotFoundError:
+        return (0,)
+    return tuple(int(part) for part in re.findall(r"\d+", version)[:2])
+
+
+@functools.lru_cache(maxsize=None)
+def _binary_only_args() -> Tuple[str, ...]:
+    """只使用预编译 wheel 的 pip 参数
+
+    缺少编译器时，源码构建会卡住数分钟后才失败，强制 wheel 可以立即失败。
+    pip >= 20.1 时额外启用 fast-deps，只按需拉取 wheel 的元数据来解析依赖。
+    """
+    args = ["--only-binary=:all:", "--prefer-binary"]
+    if _pip_version() >= (20, 1):
+        args.append("--use-feature=fast-deps")
+    return tuple(args)
+
+
+def _frozen_modules() -> set:
+    """打包环境（PyInstaller 等）中磁盘上存在的顶层模块名
+
+    首次调用时扫描一次解包目录及其 Lib/site-packages，之后复用结果。
+    归档（PYZ）中的纯 Python 模块不在磁盘上，找不到时仍需回退 find_spec。
+    """
+    global _FROZEN_MODULES
+    if _FROZEN_MODULES is None:
+        modules = set()
+        base = getattr(sys, "_MEIPASS", None) or os.path.dirname(sys.executable)
+        for root in (base, os.path.join(base, "Lib", "site-packages")):
+            try:
+                with os.scandir(root) as entries:
+                    modules.update(entry.name.split(".")[0] for entry in entries)
+            except OSError:
+                continue
+        _FROZEN_MODULES = modules
+    return _FROZEN_MODULES
 
 
 def check_module_installed(module_name: str) -> bool:
     """检查模块是否已安装
 
+    打包环境中先查一次性扫描得到的模块集合，避免逐个在归档中查找。
+
     Args:
         module_name: 模块名（用于 import）
 
     Returns:
         bool: 模块是否可导入
     """
+    if getattr(sys, "frozen", False):
+        if module_name.split(".")[0] in _frozen_modules():
+            return True
+
     try:
         # 使用 importlib.util.find_spec 检查模块是否存在
         spec = importlib.util.find_spec(module_name)
@@ -67,83 +234,336 @@ def check_module_installed(module_name: str) -> bool:
         return False
 
 
-def get_missing_dependencies() -> List[Tuple[str, str, bool]]:
-    """获取缺失的依赖列表
+def get_installed_distributions() -> set:
+    """一次性读取当前环境中已安装的发行包名称
 
     Returns:
-        List[Tuple[str, str, bool]]: 缺失的依赖列表 (模块名, pip包名, 是否必需)
+        set: 规范化后的发行包名称集合
     """
-    missing = []
+    installed = set()
+    for dist in importlib.metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            installed.add(_normalize_name(name))
+    return installed
 
-    # 检查核心依赖
-    for module_name, pip_name, required in CORE_DEPENDENCIES:
-        if not check_module_installed(module_name):
-            missing.append((module_name, pip_name, required))
 
-    # 检查平台专用依赖
+def _platform_dependencies() -> List[Dependency]:
+    """获取当前平台需要检查的全部依赖"""
+    dependencies = list(CORE_DEPENDENCIES)
+
+    # 平台专用依赖
     if sys.platform == "win32":
-        for module_name, pip_name, required in WINDOWS_DEPENDENCIES:
-            if not check_module_installed(module_name):
-                missing.append((module_name, pip_name, required))
+        dependencies += WINDOWS_DEPENDENCIES
     elif sys.platform == "darwin":
-        for module_name, pip_name, required in MACOS_DEPENDENCIES:
-            if not check_module_installed(module_name):
-                missing.append((module_name, pip_name, required))
+        dependencies += MACOS_DEPENDENCIES
+    return dependencies
 
-    return missing
 
+def get_missing_dependencies() -> List[Dependency]:
+    """获取缺失的依赖列表
 
-def install_package(pip_name: str, quiet: bool = False) -> bool:
-    """安装单个包
+    先用已安装发行包索引判断（发行包名由 pip 包名解析得到），
+    索引中找不到时再回退到 find_spec（覆盖命名空间包、打包环境等情况）。
+    回退检查在线程池中并发执行，以重叠各自的文件系统访问。
+
+    Returns:
+        List[Dependency]: 缺失的依赖列表 (模块名, pip包名, 是否必需)
+    """
+    dependencies = _platform_dependencies()
+
+    installed = get_installed_distributions()
+    unresolved = [
+        dep for dep in dependencies if _normalize_name(dep.pip_name) not in installed
+    ]
+
+    if len(unresolved) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(CHECK_WORKERS, len(unresolved))
+        ) as executor:
+            results = list(
+                executor.map(lambda dep: check_module_installed(dep.module_name), unresolved)
+            )
+    else:
+        results = [check_module_installed(dep.module_name) for dep in unresolved]
+
+    return [dep for dep, ok in zip(unresolved, results) if not ok]
+
+
+def _python_minor(version: str) -> str:
+    """从版本字符串中取出主次版本号，如 3.11.7 得到 3.11"""
+    return ".".join(version.split()[0].split(".")[:2]) if version else ""
+
+
+def write_dependency_lock(path: Path = LOCK_FILE) -> bool:
+    """生成依赖锁文件（打包时调用）
+
+    只记录当前环境中确实可用的模块；存在缺失依赖时仍会写入，
+    但缺失的模块不在列表中，运行时不会被锁文件跳过检查。
 
     Args:
-        pip_name: pip 包名（可包含版本约束）
-        quiet: 是否静默安装
+        path: 锁文件路径
 
     Returns:
-        bool: 安装是否成功
+        bool: 是否所有依赖都已包含
+    """
+    missing = {dep.module_name for dep in get_missing_dependencies()}
+    deps = [
+        dep.module_name
+        for dep in _platform_dependencies()
+        if dep.module_name not in missing
+    ]
+    path.write_text(
+        json.dumps({"python": sys.version, "deps": deps}, indent=2),
+        encoding="utf-8",
+    )
+    return not missing
+
+
+def is_dependency_lock_valid(path: Path = LOCK_FILE) -> bool:
+    """检查依赖锁文件是否与当前环境一致
+
+    锁文件存在、Python 主次版本一致，且覆盖了当前平台的全部依赖时有效。
     """
     try:
-        cmd = [sys.executable, "-m", "pip", "install", pip_name]
-        if quiet:
-            cmd.append("-q")
+        lock = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300,  # 5分钟超时
+    if not isinstance(lock, dict):
+        return False
+    if _python_minor(str(lock.get("python", ""))) != _python_minor(sys.version):
+        return False
+
+    locked = set(lock.get("deps") or [])
+    return all(dep.module_name in locked for dep in _platform_dependencies())
+
+
+def _dependency_cache_file() -> Path:
+    """依赖检查缓存文件路径
+
+    文件名由解释器路径、Python 版本和依赖列表共同决定，任何一项变化都会使缓存失效。
+    """
+    key_source = repr(
+        (
+            sys.executable,
+            sys.version,
+            CORE_DEPENDENCIES,
+            WINDOWS_DEPENDENCIES,
+            MACOS_DEPENDENCIES,
         )
+    )
+    key = hashlib.sha1(key_source.encode("utf-8")).hexdigest()
+    return CACHE_DIR / f"deps_ok_{key}"
 
-        return result.returncode == 0
-    except subprocess.TimeoutExpired:
+
+def _site_packages_dirs() -> List[str]:
+    """获取当前解释器的 site-packages 目录"""
+    dirs = []
+    if hasattr(site, "getsitepackages"):
+        dirs.extend(site.getsitepackages())
+    if hasattr(site, "getusersitepackages"):
+        dirs.append(site.getusersitepackages())
+    return dirs
+
+
+def is_dependency_cache_valid() -> bool:
+    """检查依赖缓存是否仍然有效
+
+    缓存文件存在且比所有 site-packages 目录都新时有效；
+    安装或卸载包会更新目录修改时间，从而使缓存失效。
+    """
+    try:
+        cache_mtime = _dependency_cache_file().stat().st_mtime
+    except OSError:
         return False
-    except Exception:
+
+    for path in _site_packages_dirs():
+        try:
+            if os.stat(path).st_mtime > cache_mtime:
+                return False
+        except OSError:
+            continue
+    return True
+
+
+def write_dependency_cache() -> None:
+    """记录依赖检查通过（写入失败时忽略）"""
+    try:
+        cache_file = _dependency_cache_file()
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.touch()
+    except OSError:
+        pass
+
+
+def install_package(
+    pip_name: str,
+    quiet: bool = False,
+    line_callback: Optional[Callable[[str], None]] = None,
+) -> bool:
+    """安装单个包
+
+    pip 输出逐行转发给 line_callback，而不是在进程结束后一次性返回，
+    大包（如 PySide6）下载期间也能实时反馈进度。
+
+    默认只安装预编译 wheel；失败且包在 SDIST_FALLBACK_PACKAGES 中时，
+    再允许源码构建重试一次。
+
+    Args:
+        pip_name: pip 包名（可包含版本约束）
+        quiet: 是否静默安装
+        line_callback: pip 输出行回调
+
+    Returns:
+        bool: 安装是否成功
+    """
+    args = ["install", *_no_deps_args(pip_name), pip_name]
+    if quiet:
+        args.append("-q")
+    if _run_pip([*args, *_binary_only_args()], line_callback):
+        return True
+    if _normalize_name(pip_name) not in SDIST_FALLBACK_PACKAGES:
         return False
+    return _run_pip(args, line_callback)
+
+
+def download_package(pip_name: str, dest: str) -> bool:
+    """下载单个包及其依赖到本地目录（不安装）
+
+    Args:
+        pip_name: pip 包名（可包含版本约束）
+        dest: 下载目录
+
+    Returns:
+        bool: 下载是否成功
+    """
+    return _run_pip(_download_args(pip_name, dest))
+
+
+def _download_args(pip_name: str, dest: str) -> List[str]:
+    """构造下载单个包的 pip 参数"""
+    args = ["download", "--dest", dest, *_binary_only_args(), *_no_deps_args(pip_name)]
+    return [*args, pip_name]
+
+
+def stage_packages(
+    pip_names: List[str],
+    dest: str,
+    progress_callback: Optional[callable] = None,
+) -> bool:
+    """并发下载多个包到本地目录
+
+    各包的下载相互独立，放到线程池中并行执行，网络耗时可以重叠。
+
+    Args:
+        pip_names: pip 包名列表（可包含版本约束）
+        dest: 下载目录
+        progress_callback: 进度回调函数，接收 (当前索引, 总数, 包名, 状态) 参数
+
+    Returns:
+        bool: 是否全部下载成功
+    """
+    total = len(pip_names)
+    all_ok = True
+
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, total)) as executor:
+        futures = {
+            executor.submit(download_package, name, dest): i
+            for i, name in enumerate(pip_names)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            ok = future.result()
+            all_ok = all_ok and ok
+            if progress_callback:
+                progress_callback(
+                    i, total, pip_names[i], "downloaded" if ok else "failed"
+                )
+
+    return all_ok
+
+
+def install_packages_batch(
+    pip_names: List[str],
+    progress_callback: Optional[callable] = None,
+    find_links: Optional[str] = None,
+) -> bool:
+    """在一次 pip 调用中安装多个包
+
+    共享一次解释器启动、依赖解析和 HTTP 会话。通过解析 pip 输出中的
+    "Collecting <包名>" 行上报进度。
+
+    Args:
+        pip_names: pip 包名列表（可包含版本约束）
+        progress_callback: 进度回调函数，接收 (当前索引, 总数, 包名, 状态) 参数
+        find_links: 已下载好的包目录，指定后离线安装（不访问索引）
+
+    Returns:
+        bool: 全部安装是否成功
+    """
+    total = len(pip_names)
+    index = {_normalize_name(name): i for i, name in enumerate(pip_names)}
+
+    def on_line(line: str):
+        if not progress_callback or not line.startswith("Collecting "):
+            return
+        i = index.get(_normalize_name(line[len("Collecting "):]))
+        if i is not None:
+            progress_callback(i, total, pip_names[i], "installing")
+
+    args = ["install", *_binary_only_args()]
+    if find_links:
+        args += ["--no-index", "--find-links", find_links]
+    ok = _run_pip([*args, *pip_names], on_line, timeout=PIP_TIMEOUT * total)
+
+    if ok and progress_callback:
+        for i, name in enumerate(pip_names):
+            progress_callback(i, total, name, "success")
+    return ok
 
 
 def install_missing_dependencies(
-    missing: List[Tuple[str, str, bool]],
+    missing: List[Dependency],
     progress_callback: Optional[callable] = None,
+    pip_upgrade: Optional[subprocess.Popen] = None,
 ) -> Tuple[List[str], List[str]]:
     """安装缺失的依赖
 
+    先并发下载所有包到临时目录，再一次性离线批量安装；下载失败时直接从
+    索引批量安装。批量安装失败时逐个重试，以确定具体失败的包。
+
     Args:
         missing: 缺失的依赖列表
         progress_callback: 进度回调函数，接收 (当前索引, 总数, 包名, 状态) 参数
+        pip_upgrade: 后台进行中的 pip 升级进程，开始安装前等待其结束
 
     Returns:
         Tuple[List[str], List[str]]: (成功安装的包列表, 安装失败的包列表)
     """
+    wait_pip_upgrade(pip_upgrade)
+    pip_names = [dep.pip_name for dep in missing]
+
+    with tempfile.TemporaryDirectory(prefix="astrbot-deps-") as staging_dir:
+        staged = stage_packages(pip_names, staging_dir, progress_callback)
+        if install_packages_batch(
+            pip_names, progress_callback, find_links=staging_dir if staged else None
+        ):
+            return pip_names, []
+
     success = []
     failed = []
     total = len(missing)
 
-    for i, (module_name, pip_name, required) in enumerate(missing):
+    for i, pip_name in enumerate(pip_names):
         if progress_callback:
             progress_callback(i, total, pip_name, "installing")
 
-        if install_package(pip_name):
+        def on_line(line: str, i=i, pip_name=pip_name):
+            if progress_callback and line.lstrip().startswith("Downloading "):
+                progress_callback(i, total, pip_name, "downloading")
+
+        if install_package(pip_name, line_callback=on_line):
             success.append(pip_name)
             if progress_callback:
                 progress_callback(i, total, pip_name, "success")
@@ -155,80 +575,267 @@ def install_missing_dependencies(
     return success, failed
 
 
+async def _run_pip_async(args: List[str], timeout: float = PIP_TIMEOUT) -> bool:
+    """在事件循环中运行 pip 子进程（丢弃输出）
+
+    Args:
+        args: pip 子命令及参数（不含 "python -m pip"）
+        timeout: 超时时间（秒），超时后终止进程
+
+    Returns:
+        bool: pip 是否成功退出
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "pip",
+            *args,
+            env={**PIP_ENV, **os.environ},
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+    except Exception:
+        return False
+
+    try:
+        return await asyncio.wait_for(proc.wait(), timeout) == 0
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return False
+
+
+async def install_missing_dependencies_async(
+    missing: List[Dependency],
+    progress_callback: Optional[callable] = None,
+    concurrency: int = 4,
+) -> Tuple[List[str], List[str]]:
+    """安装缺失的依赖（asyncio 版本，供已运行 qasync 事件循环的代码 await）
+
+    流程与 install_missing_dependencies 相同：下载并发执行（由信号量限制
+    同时运行的 pip 进程数），安装仍只用一次 pip 调用——多个 pip 同时
+    写入 site-packages 并不安全。
+
+    Args:
+        missing: 缺失的依赖列表
+        progress_callback: 进度回调函数，接收 (当前索引, 总数, 包名, 状态) 参数
+        concurrency: 同时进行的下载数
+
+    Returns:
+        Tuple[List[str], List[str]]: (成功安装的包列表, 安装失败的包列表)
+    """
+    pip_names = [dep.pip_name for dep in missing]
+    total = len(pip_names)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def report(i: int, status: str):
+        if progress_callback:
+            progress_callback(i, total, pip_names[i], status)
+
+    async def download(i: int, dest: str) -> bool:
+        async with semaphore:
+            ok = await _run_pip_async(_download_args(pip_names[i], dest))
+        report(i, "downloaded" if ok else "failed")
+        return ok
+
+    with tempfile.TemporaryDirectory(prefix="astrbot-deps-") as staging_dir:
+        results = await asyncio.gather(
+            *(download(i, staging_dir) for i in range(total)),
+            return_exceptions=True,
+        )
+        args = ["install", *_binary_only_args()]
+        if all(result is True for result in results):
+            args += ["--no-index", "--find-links", staging_dir]
+        if await _run_pip_async([*args, *pip_names], timeout=PIP_TIMEOUT * total):
+            for i in range(total):
+                report(i, "success")
+            return pip_names, []
+
+    # 批量安装失败，逐个安装以确定具体失败的包
+    success = []
+    failed = []
+    for i, pip_name in enumerate(pip_names):
+        report(i, "installing")
+        args = ["install", *_no_deps_args(pip_name), pip_name]
+        ok = await _run_pip_async([*args, *_binary_only_args()])
+        if not ok and _normalize_name(pip_name) in SDIST_FALLBACK_PACKAGES:
+            ok = await _run_pip_async(args)
+        (success if ok else failed).append(pip_name)
+        report(i, "success" if ok else "failed")
+
+    return success, failed
+
+
+def check_dependencies() -> List[Dependency]:
+    """检查依赖（只检查，不安装）
+
+    打包环境中存在有效的锁文件时跳过检查；否则环境未变化时直接复用
+    上次的检查结果，检查通过后写入缓存。
+
+    Returns:
+        List[Dependency]: 缺失的依赖列表 (模块名, pip包名, 是否必需)
+    """
+    # 锁文件随打包产物生成，只在打包环境中可信；开发环境中残留的旧锁文件
+    # 可能掩盖已卸载的包
+    frozen = getattr(sys, "frozen", False)
+    if (frozen and is_dependency_lock_valid()) or is_dependency_cache_valid():
+        return []
+
+    missing = get_missing_dependencies()
+    if not missing:
+        write_dependency_cache()
+    return missing
+
+
+def install_in_background(
+    missing: List[Dependency],
+    pip_upgrade: Optional[subprocess.Popen] = None,
+) -> Future:
+    """在后台线程中安装依赖
+
+    Args:
+        missing: 需要安装的依赖列表
+        pip_upgrade: 后台进行中的 pip 升级进程
+
+    Returns:
+        Future: 结果为 (成功安装的包列表, 安装失败的包列表)
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dep-install")
+    future = executor.submit(
+        install_missing_dependencies, missing, pip_upgrade=pip_upgrade
+    )
+    executor.shutdown(wait=False)
+    return future
+
+
+def _report_background_install(future: Future) -> None:
+    """后台安装完成回调"""
+    try:
+        success, failed = future.result()
+    except Exception as e:
+        print(f"警告: 后台安装可选依赖出错: {e}")
+        return
+
+    if failed:
+        print(f"警告: 可选依赖安装失败: {', '.join(failed)}，但不影响核心功能")
+    elif success:
+        print(f"可选依赖已在后台安装完成: {', '.join(success)}（重启后生效）")
+
+
+def partition_dependencies(
+    missing: List[Dependency],
+) -> Tuple[List[Dependency], List[Dependency], List[Dependency]]:
+    """一次遍历把依赖分为必需和可选两组
+
+    Returns:
+        Tuple: (必需依赖, 可选依赖, 必需在前的全部依赖)
+    """
+    required = []
+    optional = []
+    for dep in missing:
+        (required if dep.required else optional).append(dep)
+    return required, optional, required + optional
+
+
 def check_and_install_dependencies(
     auto_install: bool = True,
     show_gui: bool = True,
 ) -> Tuple[bool, str]:
     """检查并安装依赖
 
+    只缺少可选依赖时不阻塞启动，改为在后台安装；
+    缺少必需依赖时才等待安装完成。
+
     Args:
         auto_install: 是否自动安装缺失的依赖
-        show_gui: 是否显示 GUI 进度（需要 tkinter）
+        show_gui: 是否显示 GUI 进度（优先 PySide6，缺失时使用 tkinter）
 
     Returns:
         Tuple[bool, str]: (是否成功, 消息)
     """
-    missing = get_missing_dependencies()
+    missing = check_dependencies()
 
     if not missing:
         return True, "所有依赖已安装"
 
     # 分离必需和可选依赖
-    required_missing = [(m, p, r) for m, p, r in missing if r]
-    optional_missing = [(m, p, r) for m, p, r in missing if not r]
+    required_missing, optional_missing, all_missing = partition_dependencies(missing)
 
     if not auto_install:
-        missing_names = [p for _, p, _ in missing]
+        missing_names = [dep.pip_name for dep in missing]
         return False, f"缺失依赖: {', '.join(missing_names)}"
 
-    # 尝试使用 GUI 显示进度
-    if show_gui:
+    # 确实需要安装时才在后台升级 pip，与安装界面的初始化重叠；
+    # 实际安装前再等待其结束
+    pip_upgrade = start_pip_upgrade()
+
+    # 只缺可选依赖：后台安装，应用照常启动
+    if not required_missing:
+        future = install_in_background(optional_missing, pip_upgrade)
+        future.add_done_callback(_report_background_install)
+        optional_names = [dep.pip_name for dep in optional_missing]
+        return True, f"可选依赖将在后台安装: {', '.join(optional_names)}"
+
+    # 尝试使用 GUI 显示进度：优先复用 PySide6，只有 PySide6 本身缺失时才用 tkinter。
+    # 没有可用显示时 Qt 会直接中止进程，无法被下面的异常处理兜住，需事先判断
+    if show_gui and has_display():
         try:
-            return _install_with_gui(required_missing, optional_missing)
+            try:
+                return _install_with_gui_qt(
+                    required_missing, optional_missing, all_missing, pip_upgrade
+                )
+            except ImportError:
+                return _install_with_gui(
+                    required_missing, optional_missing, all_missing, pip_upgrade
+                )
         except Exception:
             # GUI 失败，回退到命令行
             pass
 
     # 命令行模式安装
-    return _install_cli(required_missing, optional_missing)
+    return _install_cli(required_missing, optional_missing, all_missing, pip_upgrade)
 
 
 def _install_cli(
-    required: List[Tuple[str, str, bool]],
-    optional: List[Tuple[str, str, bool]],
+    required: List[Dependency],
+    optional: List[Dependency],
+    all_missing: List[Dependency],
+    pip_upgrade: Optional[subprocess.Popen] = None,
 ) -> Tuple[bool, str]:
     """命令行模式安装依赖"""
     print("\n" + "=" * 60)
     print("  AstrBot Desktop Assistant - 依赖检查")
     print("=" * 60)
 
-    all_missing = required + optional
-
     if required:
         print(f"\n发现 {len(required)} 个必需依赖缺失:")
-        for _, pip_name, _ in required:
-            print(f"  - {pip_name}")
+        for dep in required:
+            print(f"  - {dep.pip_name}")
 
     if optional:
         print(f"\n发现 {len(optional)} 个可选依赖缺失:")
-        for _, pip_name, _ in optional:
-            print(f"  - {pip_name}")
+        for dep in optional:
+            print(f"  - {dep.pip_name}")
 
     print("\n正在自动安装依赖...")
 
     def progress(i, total, name, status):
         status_text = {
+            "downloading": "下载中",
+            "downloaded": "已下载",
             "installing": "安装中",
             "success": "成功",
             "failed": "失败",
         }.get(status, status)
         print(f"  [{i+1}/{total}] {name}: {status_text}")
 
-    success, failed = install_missing_dependencies(all_missing, progress)
+    success, failed = install_missing_dependencies(all_missing, progress, pip_upgrade)
 
     if failed:
         # 检查是否有必需依赖安装失败
-        required_failed = [f for f in failed if any(f == p for _, p, r in required if r)]
+        required_pip_names = {dep.pip_name for dep in required}
+        required_failed = [f for f in failed if f in required_pip_names]
         if required_failed:
             msg = f"必需依赖安装失败: {', '.join(required_failed)}"
             print(f"\n错误: {msg}")
@@ -243,16 +850,110 @@ def _install_cli(
     return True, f"成功安装 {len(success)} 个依赖"
 
 
+def has_display() -> bool:
+    """当前环境能否创建 GUI 窗口
+
+    Windows/macOS 总是有桌面会话；Linux 下需要 X11/Wayland 显示，
+    或通过 QT_QPA_PLATFORM 指定了无需显示的平台插件（如 offscreen）。
+    """
+    if not sys.platform.startswith("linux"):
+        return True
+    platform = os.environ.get("QT_QPA_PLATFORM", "")
+    if platform and not platform.startswith(("xcb", "wayland")):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def _install_with_gui_qt(
+    required: List[Dependency],
+    optional: List[Dependency],
+    all_missing: List[Dependency],
+    pip_upgrade: Optional[subprocess.Popen] = None,
+) -> Tuple[bool, str]:
+    """使用 PySide6 进度对话框显示安装进度
+
+    安装在 QThread 中执行，进度通过信号排队回到 GUI 线程更新对话框，
+    不再额外加载 Tcl/Tk。PySide6 未安装时抛出 ImportError，
+    没有可用显示时抛出 RuntimeError。
+    """
+    from PySide6.QtCore import QEventLoop, QObject, Qt, QThread, Signal, Slot
+    from PySide6.QtWidgets import QApplication, QProgressDialog
+
+    if QApplication.instance() is None and not has_display():
+        raise RuntimeError("没有可用的显示环境")
+
+    total = len(all_missing)
+
+    # 复用已有的 QApplication，之后 app.run() 同样会复用这一实例
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    dialog = QProgressDialog("准备中...", None, 0, total)
+    dialog.setWindowTitle("AstrBot Desktop Assistant - 依赖安装")
+    dialog.setWindowModality(Qt.WindowModality.ApplicationModal)
+    dialog.setMinimumWidth(500)
+    dialog.setMinimumDuration(0)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+
+    class InstallWorker(QThread):
+        progress = Signal(int, int, str, str)
+
+        def __init__(self):
+            super().__init__()
+            self.result: Tuple[List[str], List[str]] = ([], [])
+
+        def run(self):
+            self.result = install_missing_dependencies(
+                all_missing, self.progress.emit, pip_upgrade
+            )
+
+    class ProgressReceiver(QObject):
+        """位于 GUI 线程的接收者，保证槽函数在 GUI 线程中执行"""
+
+        @Slot(int, int, str, str)
+        def on_progress(self, i, total, name, status):
+            dialog.setLabelText(f"{name}: {status}")
+            dialog.setValue(i + 1)
+
+    receiver = ProgressReceiver()
+    worker = InstallWorker()
+    worker.progress.connect(receiver.on_progress)
+
+    loop = QEventLoop()
+    worker.finished.connect(loop.quit)
+
+    dialog.show()
+    worker.start()
+    loop.exec()
+    worker.wait()
+    dialog.close()
+    app.processEvents()
+
+    success, failed = worker.result
+    if failed:
+        required_pip_names = {dep.pip_name for dep in required}
+        required_failed = [f for f in failed if f in required_pip_names]
+        if required_failed:
+            return False, f"必需依赖安装失败: {', '.join(required_failed)}"
+        return True, f"可选依赖安装失败: {', '.join(failed)}"
+    return True, f"成功安装 {len(success)} 个依赖"
+
+
 def _install_with_gui(
-    required: List[Tuple[str, str, bool]],
-    optional: List[Tuple[str, str, bool]],
+    required: List[Dependency],
+    optional: List[Dependency],
+    all_missing: List[Dependency],
+    pip_upgrade: Optional[subprocess.Popen] = None,
 ) -> Tuple[bool, str]:
-    """使用 tkinter GUI 显示安装进度"""
+    """使用 tkinter GUI 显示安装进度（仅在 PySide6 缺失时使用）
+
+    工作线程只把进度放入队列，由主线程定时取出并更新控件，
+    避免在非 GUI 线程中操作 Tk。
+    """
+    import queue
     import tkinter as tk
     from tkinter import ttk
-    import threading
 
-    all_missing = required + optional
     total = len(all_missing)
 
     # 创建窗口
@@ -298,18 +999,37 @@ def _install_with_gui(
     # 结果存储
     result = {"success": True, "message": ""}
 
+    # 进度队列：工作线程写入 (i, total, name, status)，None 表示安装结束
+    progress_queue = queue.Queue()
+
+    def drain():
+        """在主线程中取出队列中的全部进度并更新控件"""
+        while True:
+            try:
+                item = progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                root.after(500, root.destroy)
+                return
+            i, total, name, status = item
+            package_var.set(f"{name}: {status}")
+            progress_var.set((i + 1) / total * 100)
+            status_var.set(f"{i + 1}/{total}")
+        root.after(50, drain)
+
     def update_progress(i, total, name, status):
-        package_var.set(f"{name}: {status}")
-        progress_var.set((i + 1) / total * 100)
-        status_var.set(f"{i + 1}/{total}")
-        root.update()
+        progress_queue.put((i, total, name, status))
 
     def install_thread():
         nonlocal result
-        success, failed = install_missing_dependencies(all_missing, update_progress)
+        success, failed = install_missing_dependencies(
+            all_missing, update_progress, pip_upgrade
+        )
 
         if failed:
-            required_failed = [f for f in failed if any(f == p for _, p, r in required if r)]
+            required_pip_names = {dep.pip_name for dep in required}
+            required_failed = [f for f in failed if f in required_pip_names]
             if required_failed:
                 result["success"] = False
                 result["message"] = f"必需依赖安装失败: {', '.join(required_failed)}"
@@ -320,11 +1040,12 @@ def _install_with_gui(
             result["success"] = True
             result["message"] = f"成功安装 {len(success)} 个依赖"
 
-        root.after(500, root.destroy)
+        progress_queue.put(None)
 
     # 启动安装线程
     thread = threading.Thread(target=install_thread, daemon=True)
     thread.start()
+    root.after(50, drain)
 
     # 运行 GUI
     root.mainloop()
@@ -333,28 +1054,57 @@ def _install_with_gui(
 
 
 def upgrade_pip() -> bool:
-    """升级 pip 到最新版本"""
+    """升级 pip 到最新版本
+
+    始终在子进程中执行：pip 不支持在已导入自身的进程里升级自己，
+    其内部 API（pip._internal）也会改写当前进程的日志配置。
+    """
+    return _run_pip(["install", "--upgrade", "pip", "-q"], timeout=120)
+
+
+def start_pip_upgrade() -> Optional[subprocess.Popen]:
+    """在后台启动 pip 升级，不等待完成
+
+    Returns:
+        Optional[subprocess.Popen]: 升级进程，启动失败时返回 None
+    """
     try:
-        result = subprocess.run(
+        return subprocess.Popen(
             [sys.executable, "-m", "pip", "install", "--upgrade", "pip", "-q"],
-            capture_output=True,
-            text=True,
-            timeout=120,
+            env={**PIP_ENV, **os.environ},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
         )
-        return result.returncode == 0
     except Exception:
-        return False
+        return None
+
+
+def wait_pip_upgrade(proc: Optional[subprocess.Popen], timeout: float = 30) -> None:
+    """等待后台 pip 升级结束，超时则终止（不影响后续安装）"""
+    if proc is None:
+        return
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
 
 
 if __name__ == "__main__":
+    # 打包时生成锁文件: python -m desktop_client.dependency_checker --write-lock
+    if "--write-lock" in sys.argv[1:]:
+        complete = write_dependency_lock()
+        print(f"已写入 {LOCK_FILE}")
+        sys.exit(0 if complete else 1)
+
     # 测试依赖检查
     print("检查依赖...")
     missing = get_missing_dependencies()
 
     if missing:
         print(f"缺失 {len(missing)} 个依赖:")
-        for module, pip_name, required in missing:
-            req_str = "[必需]" if required else "[可选]"
-            print(f"  {req_str} {module} ({pip_name})")
+        for dep in missing:
+            req_str = "[必需]" if dep.required else "[可选]"
+            print(f"  {req_str} {dep.module_name} ({dep.pip_name})")
     else:
         print("所有依赖已安装")
@@ -9,11 +9,47 @@ AstrBot Desktop Client GUI 模块
 - HotkeyManager: 快捷键管理器
 """
 
-from .floating_ball import FloatingBallWindow, CompactChatWindow
-from .settings_window import SettingsWindow
-from .system_tray import SystemTrayIcon
-from .themes import Theme, ThemeColors, theme_manager, ThemeManager, THEMES
-from .hotkeys import HotkeyConfig, HotkeyManager, hotkey_manager, get_hotkey_manager
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .floating_ball import FloatingBallWindow, CompactChatWindow
+    from .settings_window import SettingsWindow
+    from .system_tray import SystemTrayIcon
+    from .themes import Theme, ThemeColors, theme_manager, ThemeManager, THEMES
+    from .hotkeys import HotkeyConfig, HotkeyManager, hotkey_manager, get_hotkey_manager
+
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562），
+# 只用到其中一个子模块时不必加载全部窗口组件
+_LAZY_EXPORTS = {
+    "FloatingBallWindow": ".floating_ball",
+    "CompactChatWindow": ".floating_ball",
+    "SettingsWindow": ".settings_window",
+    "SystemTrayIcon": ".system_tray",
+    "Theme": ".themes",
+    "ThemeColors": ".themes",
+    "theme_manager": ".themes",
+    "ThemeManager": ".themes",
+    "THEMES": ".themes",
+    "HotkeyConfig": ".hotkeys",
+    "HotkeyManager": ".hotkeys",
+    "hotkey_manager": ".hotkeys",
+    "get_hotkey_manager": ".hotkeys",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
 
 __all__ = [
     # 悬浮球
@@ -5,9 +5,21 @@ Shared Chat Widgets for AstrBot Desktop Client
 import os
 from typing import Optional
 
-from PySide6.QtCore import Qt, Signal, QTimer, QSize, QUrl
+from PySide6.QtCore import (
+    Qt,
+    Signal,
+    QTimer,
+    QSize,
+    QUrl,
+    QObject,
+    QRunnable,
+    QThreadPool,
+)
 from PySide6.QtGui import (
     QPixmap,
+    QPixmapCache,
+    QImage,
+    QImageReader,
     QPainter,
     QDesktopServices,
 )
@@ -21,7 +33,7 @@ from PySide6.QtWidgets import (
     QApplication,
     QFrame,
     QSizePolicy,
-    QTextEdit,
+    QPlainTextEdit,
     QDialog,
     QGraphicsView,
     QGraphicsScene,
@@ -539,6 +551,70 @@ class FileMessageWidget(QFrame):
         super().mousePressEvent(event)
 
 
+def _image_cache_key(image_path: str) -> Optional[str]:
+    """图片的 QPixmapCache 键（绝对路径 + 修改时间），文件不存在时返回 None"""
+    try:
+        mtime = os.path.getmtime(image_path)
+    except OSError:
+        return None
+    return f"image:{os.path.abspath(image_path)}:{mtime}"
+
+
+class _ScaleSignals(QObject):
+    """缩放任务的信号载体（QRunnable 本身不能定义信号）"""
+
+    finished = Signal(str, QImage, QImage)  # 图片路径, 原图, 缩略图
+
+
+class _ScaleJob(QRunnable):
+    """在线程池中解码并缩放图片
+
+    只使用线程安全的 QImage，结果通过信号回到 GUI 线程再转换为 QPixmap。
+    """
+
+    def __init__(self, image_path: str, max_width: int, max_height: int):
+        super().__init__()
+        self._image_path = image_path
+        self._max_width = max_width
+        self._max_height = max_height
+        self.signals = _ScaleSignals()
+
+    def run(self):
+        image = QImage(self._image_path)
+        scaled = QImage()
+        if not image.isNull():
+            # 缩略图尺寸很小，最近邻缩放与平滑缩放肉眼差别不大
+            scaled = image.scaled(
+                self._max_width,
+                self._max_height,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.FastTransformation,
+            )
+        self.signals.finished.emit(self._image_path, image, scaled)
+
+
+class _SaveImageSignals(QObject):
+    """保存任务的信号载体"""
+
+    finished = Signal(str, bool)  # 文件路径, 是否成功
+
+
+class _SaveImageJob(QRunnable):
+    """在线程池中编码并保存图片（使用线程安全的 QImage）"""
+
+    def __init__(self, image: QImage, file_path: str, fmt: str, quality: int = -1):
+        super().__init__()
+        self._image = image
+        self._file_path = file_path
+        self._fmt = fmt
+        self._quality = quality
+        self.signals = _SaveImageSignals()
+
+    def run(self):
+        ok = self._image.save(self._file_path, self._fmt, self._quality)
+        self.signals.finished.emit(self._file_path, ok)
+
+
 class ClickableImageLabel(QLabel):
     """可点击的图片标签，支持点击放大和右键复制"""
 
@@ -547,8 +623,8 @@ class ClickableImageLabel(QLabel):
     def __init__(self, image_path: str = "", parent=None):
         super().__init__(parent)
         self._image_path = image_path
-        self._original_pixmap: Optional[QPixmap] = None
         self._scaled_size = QSize(0, 0)  # 记录缩放后的尺寸
+        self._pending_cache_keys = ("", "")  # 后台缩放结果的缓存键
         self.setCursor(Qt.CursorShape.PointingHandCursor)
         self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.customContextMenuRequested.connect(self._show_context_menu)
@@ -561,30 +637,77 @@ class ClickableImageLabel(QLabel):
             self.load_image(image_path)
 
     def load_image(self, image_path: str, max_size: int = 200):
-        """加载并缩放图片"""
+        """加载并缩放图片
+
+        原图和缩略图都缓存在 QPixmapCache 中，同一图片再次显示时
+        （重新打开窗口、重新加载历史）不再重复解码和缩放。
+        缓存未命中时先按图片头信息占位，解码和缩放交给线程池完成。
+        标签本身只持有缩略图，原图在预览或复制时才从缓存（或磁盘）取得。
+        """
         self._image_path = image_path
-        if os.path.exists(image_path):
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                self._original_pixmap = pixmap
-                # 缩放为缩略图，限制最大宽高
-                max_width = min(max_size, 300)
-                max_height = 200
-                scaled = pixmap.scaled(
-                    max_width,
-                    max_height,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation,
-                )
-                self.setPixmap(scaled)
-                # 记录缩放后的尺寸
-                self._scaled_size = scaled.size()
-                # 设置固定尺寸，避免多余空间
-                self.setFixedSize(scaled.width(), scaled.height())
-                # 设置对齐方式
-                self.setAlignment(
-                    Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop
-                )
+        key = _image_cache_key(image_path)
+        if key is None:
+            return
+        # 缩放为缩略图，限制最大宽高
+        max_width = min(max_size, 300)
+        max_height = 200
+        thumb_key = f"{key}:thumb:{max_width}x{max_height}"
+        scaled = QPixmapCache.find(thumb_key)
+        if scaled is not None:
+            # 只需要缩略图即可显示，原图即使已被缓存淘汰也不必重新解码
+            self._apply_thumbnail(scaled)
+            return
+
+        # 只读取文件头获取尺寸，用于占位，不解码像素
+        image_size = QImageReader(image_path).size()
+        if not image_size.isValid():
+            return
+        placeholder_size = image_size.scaled(
+            max_width, max_height, Qt.AspectRatioMode.KeepAspectRatio
+        )
+        placeholder = QPixmap(placeholder_size)
+        placeholder.fill(Qt.GlobalColor.transparent)
+        self._apply_thumbnail(placeholder)
+
+        self._pending_cache_keys = (key, thumb_key)
+        job = _ScaleJob(image_path, max_width, max_height)
+        # 连接到绑定方法：标签销毁时连接自动断开，结果以队列方式回到 GUI 线程
+        job.signals.finished.connect(self._on_scaled)
+        QThreadPool.globalInstance().start(job)
+
+    def _on_scaled(self, image_path: str, image: QImage, thumb: QImage):
+        """缩放任务完成（GUI 线程）"""
+        if image_path != self._image_path or image.isNull():
+            return
+        key, thumb_key = self._pending_cache_keys
+        pixmap = QPixmap.fromImage(image)
+        scaled = QPixmap.fromImage(thumb)
+        QPixmapCache.insert(key, pixmap)
+        QPixmapCache.insert(thumb_key, scaled)
+        self._apply_thumbnail(scaled)
+
+    def _get_original_pixmap(self) -> Optional[QPixmap]:
+        """取得原图：优先使用 QPixmapCache，已被淘汰时从磁盘重新加载"""
+        key = _image_cache_key(self._image_path)
+        if key is None:
+            return None
+        pixmap = QPixmapCache.find(key)
+        if pixmap is None:
+            pixmap = QPixmap(self._image_path)
+            if pixmap.isNull():
+                return None
+            QPixmapCache.insert(key, pixmap)
+        return pixmap
+
+    def _apply_thumbnail(self, scaled: QPixmap):
+        """显示缩略图并固定标签尺寸"""
+        self.setPixmap(scaled)
+        # 记录缩放后的尺寸
+        self._scaled_size = scaled.size()
+        # 设置固定尺寸，避免多余空间
+        self.setFixedSize(scaled.width(), scaled.height())
+        # 设置对齐方式
+        self.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
 
     def sizeHint(self):
         """返回推荐尺寸"""
@@ -639,26 +762,44 @@ class ClickableImageLabel(QLabel):
 
     def _copy_to_clipboard(self):
         """复制图片到剪贴板"""
-        if self._original_pixmap and not self._original_pixmap.isNull():
+        pixmap = self._get_original_pixmap()
+        if pixmap is not None:
             clipboard = QApplication.clipboard()
-            clipboard.setPixmap(self._original_pixmap)
+            clipboard.setPixmap(pixmap)
 
     def _show_preview(self):
         """显示大图预览"""
-        if self._original_pixmap and not self._original_pixmap.isNull():
-            dialog = ImagePreviewDialog(
-                self._original_pixmap, self._image_path, self.window()
-            )
-            dialog.exec()
+        pixmap = self._get_original_pixmap()
+        if pixmap is not None:
+            ImagePreviewDialog.show_preview(pixmap, self._image_path)
 
 
 class ImagePreviewDialog(QDialog):
-    """图片预览对话框"""
+    """图片预览对话框
+
+    通过 show_preview 使用时全局只创建一个实例，之后只替换显示的图片。
+    """
+
+    _shared_instance: Optional["ImagePreviewDialog"] = None
+
+    @classmethod
+    def show_preview(cls, pixmap: QPixmap, image_path: str = ""):
+        """使用共享的预览对话框显示图片（模态）"""
+        dialog = cls._shared_instance
+        if dialog is None:
+            # 无父窗口，生命周期与应用一致，不随某个聊天窗口销毁
+            dialog = cls(pixmap, image_path)
+            theme_manager.register_callback(dialog._on_theme_changed)
+            cls._shared_instance = dialog
+        else:
+            dialog.set_image(pixmap, image_path)
+        dialog.exec()
 
     def __init__(self, pixmap: QPixmap, image_path: str = "", parent=None):
         super().__init__(parent)
         self._pixmap = pixmap
         self._image_path = image_path
+        self._save_dialog: Optional[QFileDialog] = None  # 首次保存时创建
 
         self.setWindowTitle("图片预览")
         self.setModal(True)
@@ -671,36 +812,7 @@ class ImagePreviewDialog(QDialog):
             | Qt.WindowType.WindowTitleHint
         )
 
-        # 计算合适的窗口大小和位置
-        dialog_width = 800
-        dialog_height = 600
-
-        screen = QApplication.primaryScreen()
-        if screen:
-            screen_rect = screen.availableGeometry()
-            # 窗口最大为屏幕的 80%
-            max_w = int(screen_rect.width() * 0.8)
-            max_h = int(screen_rect.height() * 0.8)
-
-            img_w = pixmap.width()
-            img_h = pixmap.height()
-
-            # 如果图片比最大尺寸小，使用图片原尺寸加一点边距
-            if img_w < max_w and img_h < max_h:
-                dialog_width = min(img_w + 40, max_w)
-                dialog_height = min(img_h + 80, max_h)
-            else:
-                dialog_width = max_w
-                dialog_height = max_h
-
-            self.resize(dialog_width, dialog_height)
-
-            # 居中显示 - 使用 availableGeometry 确保在可见区域内
-            center_x = screen_rect.x() + (screen_rect.width() - dialog_width) // 2
-            center_y = screen_rect.y() + (screen_rect.height() - dialog_height) // 2
-            self.move(center_x, center_y)
-        else:
-            self.resize(dialog_width, dialog_height)
+        self._resize_for_pixmap(pixmap)
 
         # 主布局
         layout = QVBoxLayout(self)
@@ -714,6 +826,18 @@ class ImagePreviewDialog(QDialog):
         self._view.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
         self._view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self._view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        # 以鼠标位置为中心缩放
+        self._view.setTransformationAnchor(
+            QGraphicsView.ViewportAnchor.AnchorUnderMouse
+        )
+        self._view.setResizeAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+
+        # 滚轮缩放合并：一帧（约 16ms）内的多次滚动只执行一次 scale
+        self._pending_zoom = 1.0
+        self._zoom_timer = QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(16)
+        self._zoom_timer.timeout.connect(self._apply_pending_zoom)
 
         # 添加图片到场景
         self._pixmap_item = QGraphicsPixmapItem(pixmap)
@@ -751,6 +875,16 @@ class ImagePreviewDialog(QDialog):
         btn_layout.addWidget(fit_btn)
         btn_layout.addWidget(original_btn)
         btn_layout.addStretch()
+
+        # 保存结果提示
+        self._status_label = QLabel()
+        self._status_label.setVisible(False)
+        self._status_timer = QTimer(self)
+        self._status_timer.setSingleShot(True)
+        self._status_timer.setInterval(3000)
+        self._status_timer.timeout.connect(self._status_label.hide)
+        btn_layout.addWidget(self._status_label)
+
         btn_layout.addWidget(close_btn)
 
         layout.addWidget(btn_frame)
@@ -761,6 +895,58 @@ class ImagePreviewDialog(QDialog):
         # 默认适应窗口显示
         QTimer.singleShot(50, self._fit_to_window)
 
+    def set_image(self, pixmap: QPixmap, image_path: str = ""):
+        """替换显示的图片（复用已有的场景和按钮）"""
+        self._pixmap = pixmap
+        self._image_path = image_path
+        self._pixmap_item.setPixmap(pixmap)
+        self._scene.setSceneRect(self._pixmap_item.boundingRect())
+        self._resize_for_pixmap(pixmap)
+        # 默认适应窗口显示
+        QTimer.singleShot(50, self._fit_to_window)
+
+    def done(self, result: int):
+        """关闭时释放原图：共享实例常驻内存，不应一直持有上次预览的大图"""
+        super().done(result)
+        self._pixmap_item.setPixmap(QPixmap())
+        self._pixmap = QPixmap()
+
+    def _resize_for_pixmap(self, pixmap: QPixmap):
+        """根据图片尺寸计算合适的窗口大小和位置"""
+        dialog_width = 800
+        dialog_height = 600
+
+        screen = QApplication.primaryScreen()
+        if screen:
+            screen_rect = screen.availableGeometry()
+            # 窗口最大为屏幕的 80%
+            max_w = int(screen_rect.width() * 0.8)
+            max_h = int(screen_rect.height() * 0.8)
+
+            img_w = pixmap.width()
+            img_h = pixmap.height()
+
+            # 如果图片比最大尺寸小，使用图片原尺寸加一点边距
+            if img_w < max_w and img_h < max_h:
+                dialog_width = min(img_w + 40, max_w)
+                dialog_height = min(img_h + 80, max_h)
+            else:
+                dialog_width = max_w
+                dialog_height = max_h
+
+            self.resize(dialog_width, dialog_height)
+
+            # 居中显示 - 使用 availableGeometry 确保在可见区域内
+            center_x = screen_rect.x() + (screen_rect.width() - dialog_width) // 2
+            center_y = screen_rect.y() + (screen_rect.height() - dialog_height) // 2
+            self.move(center_x, center_y)
+        else:
+            self.resize(dialog_width, dialog_height)
+
+    def _on_theme_changed(self, theme: Theme):
+        """主题变化"""
+        self._apply_theme()
+
     def _apply_theme(self):
         """应用主题样式"""
         t = theme_manager.current_theme
@@ -787,6 +973,10 @@ class ImagePreviewDialog(QDialog):
             QPushButton:hover {{
                 background-color: {c.bg_hover};
             }}
+            QLabel {{
+                color: {c.text_secondary};
+                font-size: {t.font_size_base}px;
+            }}
         """)
 
     def _copy_to_clipboard(self):
@@ -802,21 +992,40 @@ class ImagePreviewDialog(QDialog):
         if self._image_path and os.path.exists(self._image_path):
             default_name = os.path.basename(self._image_path)
 
-        # 打开保存对话框
-        file_path, selected_filter = QFileDialog.getSaveFileName(
-            self,
-            "保存图片",
-            default_name,
-            "PNG 图片 (*.png);;JPEG 图片 (*.jpg *.jpeg);;所有文件 (*.*)",
-        )
+        # 打开保存对话框（复用同一个实例，并保留上次保存的目录）
+        if self._save_dialog is None:
+            self._save_dialog = QFileDialog(self, "保存图片")
+            self._save_dialog.setAcceptMode(QFileDialog.AcceptMode.AcceptSave)
+            self._save_dialog.setFileMode(QFileDialog.FileMode.AnyFile)
+            self._save_dialog.setNameFilters(
+                ["PNG 图片 (*.png)", "JPEG 图片 (*.jpg *.jpeg)", "所有文件 (*.*)"]
+            )
+        self._save_dialog.selectFile(default_name)
+        if not self._save_dialog.exec():
+            return
 
+        selected_files = self._save_dialog.selectedFiles()
+        file_path = selected_files[0] if selected_files else ""
         if file_path:
             # 根据扩展名确定格式
             ext = os.path.splitext(file_path)[1].lower()
             if ext in [".jpg", ".jpeg"]:
-                self._pixmap.save(file_path, "JPEG", 95)
+                fmt, quality = "JPEG", 95
             else:
-                self._pixmap.save(file_path, "PNG")
+                fmt, quality = "PNG", -1
+            # 编码大图较慢，放到线程池中执行
+            job = _SaveImageJob(self._pixmap.toImage(), file_path, fmt, quality)
+            job.signals.finished.connect(self._on_image_saved)
+            QThreadPool.globalInstance().start(job)
+
+    def _on_image_saved(self, file_path: str, ok: bool):
+        """图片保存完成（GUI 线程）"""
+        if ok:
+            self._status_label.setText(f"已保存: {os.path.basename(file_path)}")
+        else:
+            self._status_label.setText("保存失败")
+        self._status_label.show()
+        self._status_timer.start()
 
     def _fit_to_window(self):
         """适应窗口显示"""
@@ -827,16 +1036,29 @@ class ImagePreviewDialog(QDialog):
         self._view.resetTransform()
 
     def wheelEvent(self, event):
-        """鼠标滚轮缩放"""
+        """鼠标滚轮缩放（累积缩放倍数，由定时器合并执行）"""
         factor = 1.15
         if event.angleDelta().y() > 0:
-            self._view.scale(factor, factor)
+            self._pending_zoom *= factor
         else:
-            self._view.scale(1 / factor, 1 / factor)
+            self._pending_zoom /= factor
+        if not self._zoom_timer.isActive():
+            self._zoom_timer.start()
+
+    def _apply_pending_zoom(self):
+        """执行累积的滚轮缩放"""
+        zoom = self._pending_zoom
+        self._pending_zoom = 1.0
+        if zoom != 1.0:
+            self._view.scale(zoom, zoom)
+
 
+class PasteAwareTextEdit(QPlainTextEdit):
+    """支持图片粘贴的输入框
 
-class PasteAwareTextEdit(QTextEdit):
-    """支持图片粘贴的输入框"""
+    只需要纯文本，基于 QPlainTextEdit 以获得更轻量的文档模型；
+    粘贴的富文本由 QPlainTextEdit 自动转为纯文本。
+    """
 
     image_pasted = Signal(str)
     enter_pressed = Signal()
@@ -844,7 +1066,7 @@ class PasteAwareTextEdit(QTextEdit):
     def canInsertFromMimeData(self, source):
         if source.hasImage():
             return True
-        return QTextEdit.canInsertFromMimeData(self, source)
+        return QPlainTextEdit.canInsertFromMimeData(self, source)
 
     def insertFromMimeData(self, source):
         if source.hasImage():
@@ -856,14 +1078,14 @@ class PasteAwareTextEdit(QTextEdit):
                     image.save(f.name, "PNG")
                 self.image_pasted.emit(f.name)
             return
-        QTextEdit.insertFromMimeData(self, source)
+        QPlainTextEdit.insertFromMimeData(self, source)
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Return:
             if event.modifiers() == Qt.KeyboardModifier.ShiftModifier:
-                QTextEdit.keyPressEvent(self, event)
+                QPlainTextEdit.keyPressEvent(self, event)
             else:
                 self.enter_pressed.emit()
                 event.accept()
         else:
-            QTextEdit.keyPressEvent(self, event)
+            QPlainTextEdit.keyPressEvent(self, event)
@@ -11,11 +11,13 @@
 - 聊天记录持久化和跨窗口同步
 """
 
-from typing import Optional, Set
+from typing import Any, Dict, List, Optional, Tuple
 import os
 import sys
 import math
+import time
 from enum import Enum
+from functools import partial
 
 from PySide6.QtCore import (
     Qt,
@@ -27,6 +29,7 @@ from PySide6.QtCore import (
     Property,
     QSize,
     QRectF,
+    QEvent,
 )
 from PySide6.QtGui import (
     QPixmap,
@@ -39,6 +42,8 @@ from PySide6.QtGui import (
     QPainterPath,
     QImage,
     QCursor,
+    QPixmapCache,
+    QAction,
 )
 from PySide6.QtWidgets import (
     QWidget,
@@ -143,6 +148,191 @@ def _set_macos_window_level(widget: QWidget, level: Optional[int] = None):
         print(f"[macOS] 设置窗口层级失败: {e}")
 
 
+# 音频文件存在性检查结果的有效期（秒）
+_AUDIO_EXISTS_TTL = 30.0
+
+# 滚动到顶部时每次额外加载的更早消息数
+_HYDRATE_BATCH = 15
+
+# 紧凑聊天窗口整体样式表模板（占位符由 _window_style_subs 提供）
+_WINDOW_STYLE_TEMPLATE = """
+    QFrame#compactContainer {{
+        background-color: {container_bg};
+        border: 1px solid {border_light};
+        border-radius: {container_radius}px;
+    }}
+    QPushButton#compactCloseBtn {{
+        background: transparent;
+        color: {text_secondary};
+        border: none;
+        border-radius: 12px;
+        font-size: 16px;
+        font-weight: bold;
+        padding-bottom: 2px;
+    }}
+    QPushButton#compactCloseBtn:hover {{
+        background-color: #ff4d4f;
+        color: white;
+    }}
+    QScrollArea#compactScroll {{
+        background: transparent;
+        border: none;
+    }}
+    QScrollArea#compactScroll QScrollBar:vertical {{
+        background: {bg_secondary};
+        width: 6px;
+        border-radius: 3px;
+    }}
+    QScrollArea#compactScroll QScrollBar::handle:vertical {{
+        background: {text_secondary};
+        border-radius: 3px;
+        min-height: 20px;
+    }}
+    QScrollArea#compactScroll QScrollBar::add-line:vertical,
+    QScrollArea#compactScroll QScrollBar::sub-line:vertical {{
+        height: 0px;
+    }}
+    QWidget#compactHistory {{
+        background: transparent;
+    }}
+    QPlainTextEdit#compactInput {{
+        background-color: {bg_secondary};
+        border: 1px solid {border_light};
+        border-radius: {radius}px;
+        padding: 8px;
+        font-family: {font_family};
+        font-size: {font_size_base}px;
+        color: {text_primary};
+    }}
+    QPlainTextEdit#compactInput:focus {{
+        border: 1px solid {primary};
+    }}
+    QPushButton#compactSendBtn {{
+        background-color: {primary};
+        color: white;
+        border: none;
+        border-radius: {radius}px;
+        font-weight: bold;
+    }}
+    QPushButton#compactSendBtn:hover {{
+        background-color: {primary_dark};
+    }}
+    QPushButton#compactSendBtn:disabled {{
+        background-color: {text_secondary};
+    }}
+    QPushButton#compactAttachBtn {{
+        background-color: {bg_secondary};
+        color: {text_primary};
+        border: 1px solid {border_light};
+        border-radius: {radius}px;
+    }}
+    QPushButton#compactAttachBtn:hover {{
+        background-color: {bg_hover};
+    }}
+    /* 用户消息气泡：抖音风格大圆角 + 右下角小圆角（尾巴效果） */
+    QLabel#userBubble {{
+        color: {bubble_user_text};
+        background-color: {bubble_user_bg};
+        border-radius: {radius_large}px;
+        border-bottom-right-radius: 4px;
+        padding: 12px 16px;
+        font-family: {font_family};
+        font-size: {font_size_base}px;
+    }}
+    /* AI 消息气泡：大圆角 + 左下角小圆角（尾巴效果） */
+    QFrame#aiBubble {{
+        background-color: {bubble_ai_bg};
+        border: 1px solid {bubble_ai_border};
+        border-radius: {radius_large}px;
+        border-bottom-left-radius: 4px;
+        padding: 0px;
+    }}
+    /* 消息头像：图片头像透明背景，无图片时使用主题色圆形底 */
+    QLabel#avatarImage {{
+        background: transparent;
+    }}
+    QLabel#userAvatarFallback {{
+        font-size: 20px;
+        background-color: {primary};
+        border-radius: 16px;
+        color: white;
+    }}
+    QLabel#botAvatarFallback {{
+        font-size: 20px;
+        background-color: {bg_tertiary};
+        border-radius: 16px;
+    }}
+    QLabel#botAvatarFallbackSmall {{
+        font-size: 16px;
+        background-color: {bg_tertiary};
+        border-radius: 12px;
+    }}
+"""
+
+# 模板中直接引用的颜色字段
+_WINDOW_STYLE_COLORS = (
+    "bg_hover",
+    "bg_secondary",
+    "bg_tertiary",
+    "border_light",
+    "bubble_ai_bg",
+    "bubble_ai_border",
+    "bubble_user_bg",
+    "bubble_user_text",
+    "primary",
+    "primary_dark",
+    "text_primary",
+    "text_secondary",
+)
+
+# 窗口样式表缓存：模板替换值 -> 样式表
+_STYLE_CACHE: Dict[tuple, str] = {}
+
+
+def _window_style_subs(t: Theme, c, has_background: bool) -> Dict[str, Any]:
+    """一次性取出样式表模板需要的主题属性"""
+    subs = {name: getattr(c, name) for name in _WINDOW_STYLE_COLORS}
+    # 容器 - 如果有背景图则透明
+    subs["container_bg"] = "transparent" if has_background else c.bg_primary
+    subs["container_radius"] = t.border_radius + 4
+    subs["radius"] = t.border_radius
+    subs["radius_large"] = t.border_radius_large
+    subs["font_family"] = t.font_family
+    subs["font_size_base"] = t.font_size_base
+    return subs
+
+
+def _build_window_style(t: Theme, c, has_background: bool) -> str:
+    """生成紧凑聊天窗口的整体样式表（按替换值缓存）"""
+    subs = _window_style_subs(t, c, has_background)
+    key = tuple(subs.items())
+    style = _STYLE_CACHE.get(key)
+    if style is None:
+        style = _WINDOW_STYLE_TEMPLATE.format(**subs)
+        _STYLE_CACHE[key] = style
+    return style
+
+
+# 圆形头像的 alpha 遮罩缓存：像素尺寸 -> 遮罩图
+_CIRCLE_MASKS: Dict[int, QImage] = {}
+
+
+def _circle_mask(size: int) -> QImage:
+    """获取指定像素尺寸的圆形 alpha 遮罩（抗锯齿，按尺寸缓存）"""
+    mask = _CIRCLE_MASKS.get(size)
+    if mask is None:
+        mask = QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+        mask.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(mask)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(Qt.GlobalColor.white)
+        painter.drawEllipse(0, 0, size, size)
+        painter.end()
+        _CIRCLE_MASKS[size] = mask
+    return mask
+
+
 class FloatingBallState(Enum):
     """悬浮球状态"""
 
@@ -153,6 +343,16 @@ class FloatingBallState(Enum):
     UNREAD_MESSAGE = "unread_message"  # 有未读消息
 
 
+# 悬浮球各状态的默认图标（未列出的状态使用 "bot"）
+_STATE_ICONS = {
+    FloatingBallState.NORMAL: "bot",
+    FloatingBallState.BUSY: "message-square",
+    FloatingBallState.PROCESSING: "refresh-cw",
+    FloatingBallState.DISCONNECTED: "zap-off",
+    FloatingBallState.UNREAD_MESSAGE: "bot",
+}
+
+
 class CompactChatWindow(QWidget):
     """精简版对话窗口 - 替代原有的气泡和输入框，提供统一体验"""
 
@@ -177,6 +377,8 @@ class CompactChatWindow(QWidget):
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
 
         self._max_history = max_history
+        # 当前最多显示的消息数：向上滚动加载更早消息时增大，回到底部后恢复
+        self._display_limit = max_history
         self._message_history = []  # [(msg_type, content, is_user), ...]
         self._attachment_path = None
         self._is_waiting = False
@@ -191,11 +393,35 @@ class CompactChatWindow(QWidget):
         self._current_ai_label = None  # 当前 AI 回复的 MarkdownLabel
         self._current_ai_message_id: str = ""  # 当前流式响应的消息ID
 
-        # 已显示消息ID集合，用于避免重复显示
-        self._displayed_message_ids: Set[str] = set()
-
-        # 消息ID与MarkdownLabel的映射，用于更新消息
-        self._message_labels: dict = {}  # {message_id: MarkdownLabel}
+        # 已显示的消息ID与MarkdownLabel的映射，用于避免重复显示和更新消息
+        # （非文本消息的值为 None）
+        self._message_labels: Dict[str, Optional[MarkdownLabel]] = {}
+
+        # 被移出历史的文本消息行对象池 {"user_text"/"ai_text": [行控件, ...]}，
+        # 新消息优先复用，避免反复创建容器、布局、头像和气泡控件
+        self._row_pool: Dict[str, List[QWidget]] = {"user_text": [], "ai_text": []}
+
+        # 待渲染的消息更新 {message_id: content}，约 60ms 合并渲染一次
+        self._pending_md_updates: Dict[str, str] = {}
+        self._md_update_timer = QTimer(self)
+        self._md_update_timer.setSingleShot(True)
+        self._md_update_timer.setInterval(60)
+        self._md_update_timer.timeout.connect(self._flush_markdown_updates)
+
+        # 流式响应片段先累积，约 80ms 写入历史记录并刷新一次
+        self._stream_flush_timer = QTimer(self)
+        self._stream_flush_timer.setSingleShot(True)
+        self._stream_flush_timer.setInterval(80)
+        self._stream_flush_timer.timeout.connect(self._flush_stream)
+
+        # 布局变化后统一调整窗口高度并滚动到底部，连续的插入/更新只触发一次
+        self._geom_timer = QTimer(self)
+        self._geom_timer.setSingleShot(True)
+        self._geom_timer.setInterval(50)
+        self._geom_timer.timeout.connect(self._update_geometry_and_scroll)
+        # 加载更早消息后按距底部的距离保持滚动位置（而不是滚到底部），
+        # 直到用户滚动或有新消息为止
+        self._scroll_restore_from_bottom: Optional[int] = None
 
         # 历史记录加载状态标志
         self._history_loaded = False
@@ -204,11 +430,22 @@ class CompactChatWindow(QWidget):
         # 聊天记录管理器
         self._chat_history = get_chat_history_manager()
 
+        # 回复结束后的保存延迟进行，连续多轮对话只写一次文件
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(2000)
+        self._save_timer.timeout.connect(self._chat_history.save_to_file)
+
         # 自定义头像路径
         self._user_avatar_path = ""
         self._bot_avatar_path = ""
         self._user_avatar_pixmap: Optional[QPixmap] = None
         self._bot_avatar_pixmap: Optional[QPixmap] = None
+        # 圆形头像缓存键（路径 + 修改时间），头像文件变化后自动失效
+        self._user_avatar_key = ""
+        self._bot_avatar_key = ""
+        # 本窗口已取得的圆形头像 {(is_user, size): QPixmap}，更换头像时清空
+        self._circular_avatars: Dict[Tuple[bool, int], QPixmap] = {}
 
         # 调整大小相关状态
         self._resizing = False
@@ -228,6 +465,12 @@ class CompactChatWindow(QWidget):
         self._background_pixmap: Optional[QPixmap] = None
         self._background_image: Optional[QImage] = None
 
+        # 已确认存在的音频文件 -> 确认时间
+        self._audio_exists_cache: Dict[str, float] = {}
+
+        # 已应用的窗口样式表对应的主题键
+        self._applied_style_key: Optional[tuple] = None
+
         # 主容器
         self._container = QFrame()
         self._container.setObjectName("compactContainer")
@@ -269,6 +512,10 @@ class CompactChatWindow(QWidget):
         self._scroll_area.setVerticalScrollBarPolicy(
             Qt.ScrollBarPolicy.ScrollBarAsNeeded
         )
+        scrollbar = self._scroll_area.verticalScrollBar()
+        scrollbar.valueChanged.connect(self._check_hydration_needed)
+        scrollbar.rangeChanged.connect(self._on_scroll_range_changed)
+        scrollbar.actionTriggered.connect(self._on_scroll_action)
 
         # 设置初始大小，不限制最小尺寸
         # self.setMinimumWidth(300)
@@ -297,14 +544,7 @@ class CompactChatWindow(QWidget):
                 pass
         self.resize(default_width, default_height)
 
-        self._history_widget = QWidget()
-        self._history_layout = QVBoxLayout(self._history_widget)
-        self._history_layout.setContentsMargins(0, 0, 0, 0)
-        self._history_layout.setSpacing(8)
-        # 将 stretch 放在开头，让消息从底部向上堆叠（类似微信风格）
-        self._history_layout.addStretch(1)
-
-        self._scroll_area.setWidget(self._history_widget)
+        self._reset_history_widget()
         container_layout.addWidget(self._scroll_area)
 
         # 3. 附件预览区 (隐藏)
@@ -344,6 +584,7 @@ class CompactChatWindow(QWidget):
         input_layout.addWidget(self._attach_btn)
 
         self._input = PasteAwareTextEdit()
+        self._input.setObjectName("compactInput")
         self._input.setPlaceholderText("输入消息...")
         self._input.setFixedHeight(40)
         self._input.setSizePolicy(
@@ -368,13 +609,10 @@ class CompactChatWindow(QWidget):
 
         # 应用主题
         self._apply_theme()
-        theme_manager.register_callback(self._on_theme_changed)
 
-        # 连接聊天记录管理器的信号
-        self._chat_history.message_added.connect(self._on_history_message_added)
-        self._chat_history.message_updated.connect(self._on_history_message_updated)
-        self._chat_history.messages_cleared.connect(self._on_history_cleared)
-        self._chat_history.history_loaded.connect(self._on_history_loaded)
+        # 注册主题回调并连接聊天记录管理器的信号（关闭窗口时断开）
+        self._sources_connected = False
+        self._connect_sources()
 
         # 历史记录将由 FloatingBallWindow 在头像设置完成后统一加载
         # 移除这里的延迟加载，避免与 FloatingBallWindow 中的 reload_history_display 产生竞态条件
@@ -397,163 +635,29 @@ class CompactChatWindow(QWidget):
             theme_manager.get_current_colors()
         )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
 
-        # 容器 - 如果有背景图则透明
-        if self._has_background():
-            self._container.setStyleSheet(f"""
-                QFrame#compactContainer {{
-                    background-color: transparent;
-                    border: 1px solid {c.border_light};
-                    border-radius: {t.border_radius + 4}px;
-                }}
-            """)
-        else:
-            self._container.setStyleSheet(f"""
-                QFrame#compactContainer {{
-                    background-color: {c.bg_primary};
-                    border: 1px solid {c.border_light};
-                    border-radius: {t.border_radius + 4}px;
-                }}
-            """)
-
-        # 关闭按钮
-        self._close_btn.setStyleSheet(f"""
-            QPushButton#compactCloseBtn {{
-                background: transparent;
-                color: {c.text_secondary};
-                border: none;
-                border-radius: 12px;
-                font-size: 16px;
-                font-weight: bold;
-                padding-bottom: 2px;
-            }}
-            QPushButton#compactCloseBtn:hover {{
-                background-color: #ff4d4f;
-                color: white;
-            }}
-        """)
-
-        # 滚动区
-        self._scroll_area.setStyleSheet(f"""
-            QScrollArea#compactScroll {{
-                background: transparent;
-                border: none;
-            }}
-            QScrollArea#compactScroll QScrollBar:vertical {{
-                background: {c.bg_secondary};
-                width: 6px;
-                border-radius: 3px;
-            }}
-            QScrollArea#compactScroll QScrollBar::handle:vertical {{
-                background: {c.text_secondary};
-                border-radius: 3px;
-                min-height: 20px;
-            }}
-            QScrollArea#compactScroll QScrollBar::add-line:vertical,
-            QScrollArea#compactScroll QScrollBar::sub-line:vertical {{
-                height: 0px;
-            }}
-        """)
-
-        self._history_widget.setStyleSheet("background: transparent;")
-
-        # 输入框
-        self._input.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {c.bg_secondary};
-                border: 1px solid {c.border_light};
-                border-radius: {t.border_radius}px;
-                padding: 8px;
-                font-family: {t.font_family};
-                font-size: {t.font_size_base}px;
-                color: {c.text_primary};
-            }}
-            QTextEdit:focus {{
-                border: 1px solid {c.primary};
-            }}
-        """)
-
-        # 发送按钮
-        self._send_btn.setStyleSheet(f"""
-            QPushButton#compactSendBtn {{
-                background-color: {c.primary};
-                color: white;
-                border: none;
-                border-radius: {t.border_radius}px;
-                font-weight: bold;
-            }}
-            QPushButton#compactSendBtn:hover {{
-                background-color: {c.primary_dark};
-            }}
-            QPushButton#compactSendBtn:disabled {{
-                background-color: {c.text_secondary};
-            }}
-        """)
+        # 整个窗口共用一份样式表，主题未变化时不重复解析
+        style_key = (repr(t), repr(c), self._has_background())
+        if style_key == self._applied_style_key:
+            return
+        self._applied_style_key = style_key
+        self.setStyleSheet(_build_window_style(t, c, self._has_background()))
+        # 头像样式由窗口样式表按 objectName 提供，这里只需更新默认头像图标的颜色
+        for avatar in self.findChildren(QLabel, "userAvatarFallback"):
+            avatar.setPixmap(icon_manager.get_pixmap("user", c.text_inverse, 20))
+        for avatar in self.findChildren(QLabel, "botAvatarFallback"):
+            avatar.setPixmap(icon_manager.get_pixmap("bot", c.text_primary, 20))
+        for avatar in self.findChildren(QLabel, "botAvatarFallbackSmall"):
+            avatar.setPixmap(icon_manager.get_pixmap("bot", c.text_primary, 16))
 
-        # 附件按钮
-        self._attach_btn.setStyleSheet(f"""
-            QPushButton#compactAttachBtn {{
-                background-color: {c.bg_secondary};
-                color: {c.text_primary};
-                border: 1px solid {c.border_light};
-                border-radius: {t.border_radius}px;
-            }}
-            QPushButton#compactAttachBtn:hover {{
-                background-color: {c.bg_hover};
-            }}
-        """)
         # 设置附件图标
         attach_icon = icon_manager.get_icon("attach", c.text_primary, 18)
         self._attach_btn.setIcon(attach_icon)
         self._attach_btn.setIconSize(QSize(18, 18))
 
-        # 刷新所有历史消息的样式 (主要是 MarkdownLabel 和用户消息气泡)
-        for i in range(self._history_layout.count()):
-            item = self._history_layout.itemAt(i)
-            if item and item.widget():
-                container = item.widget()
-                # 遍历容器中的所有子组件
-                self._update_widget_theme(container, c, t)
-
-    def _update_widget_theme(self, widget, c, t):
-        """递归更新组件及其子组件的主题"""
-        if isinstance(widget, MarkdownLabel):
-            widget.update_theme()
-        elif isinstance(widget, QFrame):
-            # 检查是否是 AI 气泡容器
-            if widget.objectName() == "aiBubble":
-                widget.setStyleSheet(f"""
-                    QFrame#aiBubble {{
-                        background-color: {c.bubble_ai_bg};
-                        border: 1px solid {c.bubble_ai_border};
-                        border-radius: {t.border_radius_large}px;
-                        border-bottom-left-radius: 4px;
-                        padding: 0px;
-                    }}
-                """)
-        elif isinstance(widget, QLabel):
-            # 检查是否是用户消息气泡（通过检查样式表中是否包含 bubble 相关颜色）
-            current_style = widget.styleSheet()
-            if "bubble" in current_style.lower() or "background-color" in current_style:
-                # 判断是用户消息还是头像标签
-                # 用户消息气泡有 padding: 12px 16px（抖音风格）
-                if "padding: 12px 16px" in current_style:
-                    widget.setStyleSheet(f"""
-                        QLabel {{
-                            color: {c.bubble_user_text};
-                            background-color: {c.bubble_user_bg};
-                            border-radius: {t.border_radius_large}px;
-                            border-bottom-right-radius: 4px;
-                            padding: 12px 16px;
-                            font-family: {t.font_family};
-                            font-size: {t.font_size_base}px;
-                        }}
-                    """)
-
-        # 递归处理子组件
-        if hasattr(widget, "children"):
-            for child in widget.children():
-                if isinstance(child, QWidget):
-                    self._update_widget_theme(child, c, t)
+        # 气泡由窗口样式表覆盖，只需重新渲染 Markdown 内容
+        # （包括对象池中暂存的行，它们挂在窗口下）
+        for md_label in self.findChildren(MarkdownLabel):
+            md_label.update_theme()
 
     def set_always_on_top(self, enabled: bool) -> None:
         self._always_on_top = bool(enabled)
@@ -681,10 +785,15 @@ class CompactChatWindow(QWidget):
         if avatar_path and os.path.exists(avatar_path):
             pixmap = QPixmap(avatar_path)
             if not pixmap.isNull():
-                # 保持原始分辨率，缩放由 _create_circular_avatar 统一处理
-                self._user_avatar_pixmap = pixmap
+                self._user_avatar_pixmap = self._shrink_avatar_source(pixmap)
+                self._user_avatar_key = self._avatar_cache_key(avatar_path)
         else:
             self._user_avatar_pixmap = None
+            self._user_avatar_key = ""
+        self._drop_circular_avatars(is_user=True)
+        # 预先生成消息中使用的用户头像（32px），重新加载历史时每条消息直接复用
+        if self._user_avatar_pixmap is not None:
+            self._get_circular_avatar(is_user=True, size=32)
 
     def set_bot_avatar(self, avatar_path: str):
         """设置Bot头像路径"""
@@ -692,10 +801,77 @@ class CompactChatWindow(QWidget):
         if avatar_path and os.path.exists(avatar_path):
             pixmap = QPixmap(avatar_path)
             if not pixmap.isNull():
-                # 保持原始分辨率，缩放由 _create_circular_avatar 统一处理
-                self._bot_avatar_pixmap = pixmap
+                self._bot_avatar_pixmap = self._shrink_avatar_source(pixmap)
+                self._bot_avatar_key = self._avatar_cache_key(avatar_path)
         else:
             self._bot_avatar_pixmap = None
+            self._bot_avatar_key = ""
+        self._drop_circular_avatars(is_user=False)
+        # 预先生成消息中使用的 Bot 头像（文本/语音 32px，语音快捷消息 24px）
+        if self._bot_avatar_pixmap is not None:
+            self._get_circular_avatar(is_user=False, size=32)
+            self._get_circular_avatar(is_user=False, size=24)
+
+    @staticmethod
+    def _shrink_avatar_source(pixmap: QPixmap) -> QPixmap:
+        """把头像原图一次性缩小到消息头像的最大像素尺寸（32px × 设备像素比）
+
+        之后生成各尺寸圆形头像时只需缩放这张小图，不再每次从原图缩放；
+        按短边铺满（KeepAspectRatioByExpanding），居中裁剪由 _create_circular_avatar 完成。
+        """
+        screen = QApplication.primaryScreen()
+        dpr = screen.devicePixelRatio() if screen else 1.0
+        target = int(32 * dpr)
+        if min(pixmap.width(), pixmap.height()) <= target:
+            return pixmap
+        return pixmap.scaled(
+            target,
+            target,
+            Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+
+    def _drop_circular_avatars(self, is_user: bool):
+        """清除本窗口中某一方的圆形头像引用"""
+        for key in [k for k in self._circular_avatars if k[0] == is_user]:
+            del self._circular_avatars[key]
+
+    @staticmethod
+    def _avatar_cache_key(avatar_path: str) -> str:
+        """头像缓存键：绝对路径 + 修改时间"""
+        try:
+            mtime = os.path.getmtime(avatar_path)
+        except OSError:
+            mtime = 0
+        return f"{os.path.abspath(avatar_path)}:{mtime}"
+
+    def _get_circular_avatar(self, is_user: bool, size: int) -> QPixmap:
+        """获取圆形头像
+
+        结果按 (头像文件, 尺寸, 设备像素比) 存入 QPixmapCache，
+        每条消息及多个窗口共享同一个 QPixmap，不再逐条重新绘制。
+        本窗口取得的结果再保存一份引用，后续消息直接复用。
+        """
+        circular = self._circular_avatars.get((is_user, size))
+        if circular is not None:
+            return circular
+
+        if is_user:
+            pixmap, avatar_key = self._user_avatar_pixmap, self._user_avatar_key
+        else:
+            pixmap, avatar_key = self._bot_avatar_pixmap, self._bot_avatar_key
+
+        screen = QApplication.primaryScreen()
+        dpr = screen.devicePixelRatio() if screen else 1.0
+        key = f"circular_avatar:{avatar_key}:{size}:{dpr}"
+        circular = QPixmapCache.find(key)
+        if circular is None or circular.isNull():
+            circular = self._create_circular_avatar(pixmap, size)
+            if circular.isNull():
+                return circular
+            QPixmapCache.insert(key, circular)
+        self._circular_avatars[(is_user, size)] = circular
+        return circular
 
     def reload_history_display(self):
         """重新加载历史记录显示（在头像设置后调用）
@@ -708,33 +884,78 @@ class CompactChatWindow(QWidget):
             print("[CompactChatWindow] 历史记录正在加载中，跳过重复加载")
             return
 
-        self._history_loading = True
+        # 先暂停重绘，再整体替换消息容器，替换过程本身也不触发绘制
+        self._begin_batch_load()
+        self._reset_history_widget()
 
         try:
-            # 清空当前显示（保留索引 0 的 stretch）
-            while self._history_layout.count() > 1:
-                item = self._history_layout.itemAt(1)  # 从索引 1 开始删除，保留 stretch
-                if item and item.widget():
-                    w = item.widget()
-                    if w is not None:
-                        self._history_layout.removeWidget(w)
-                        w.deleteLater()
-
-            self._displayed_message_ids.clear()
             self._message_labels.clear()
+            self._pending_md_updates.clear()
 
-            # 重新加载显示
-            messages = self._chat_history.get_messages()
+            # 重新加载显示：只渲染最近 _display_limit 条，更早的消息
+            # 即使创建了也会被 _add_to_history 的数量上限立即移除
+            messages = self._chat_history.get_messages(limit=self._display_limit)
             print(f"[CompactChatWindow] 加载 {len(messages)} 条历史记录")
 
             for msg in messages:
                 self._display_message_from_history(msg)
 
+            # 旧标签已随容器回收，正在流式输出的回复改由新建的标签继续渲染
+            if self._current_ai_message_id:
+                self._current_ai_label = self._message_labels.get(
+                    self._current_ai_message_id
+                )
+
             self._history_loaded = True
-            self._scroll_to_bottom()
 
         finally:
-            self._history_loading = False
+            self._finish_batch_load()
+
+    def _reset_history_widget(self):
+        """创建新的消息容器并替换到滚动区
+
+        旧容器整体 deleteLater，避免逐个 removeWidget 导致布局反复重排；
+        其中可复用的文本消息行先回收到对象池，重新加载时不必重新创建。
+        """
+        history_widget = QWidget()
+        history_widget.setObjectName("compactHistory")
+        history_layout = QVBoxLayout(history_widget)
+        history_layout.setContentsMargins(0, 0, 0, 0)
+        history_layout.setSpacing(8)
+        # 底部对齐，让消息从底部向上堆叠（类似微信风格），无需额外的 stretch
+        history_layout.setAlignment(Qt.AlignmentFlag.AlignBottom)
+
+        old_widget = self._scroll_area.takeWidget()
+        if old_widget is not None:
+            old_layout = self._history_layout
+            pooled_rows = []
+            for i in range(old_layout.count()):
+                row = old_layout.itemAt(i).widget()
+                if row is not None and getattr(row, "_pool_kind", None):
+                    pooled_rows.append(row)
+            for row in pooled_rows:
+                self._release_row(row)
+        self._history_widget = history_widget
+        self._history_layout = history_layout
+        self._scroll_area.setWidget(history_widget)
+        if old_widget is not None:
+            old_widget.deleteLater()
+
+    def _begin_batch_load(self):
+        """开始批量加载：暂停重绘，期间 _add_to_history 不再逐条调度布局和滚动
+
+        在滚动区上暂停更新，消息容器与滚动条一并暂停（替换后的新容器会继承该状态）。
+        """
+        self._history_loading = True
+        self._geom_timer.stop()
+        self._scroll_area.setUpdatesEnabled(False)
+
+    def _finish_batch_load(self):
+        """结束批量加载：恢复重绘，统一布局并滚动到底部"""
+        self._history_loading = False
+        self._history_layout.invalidate()
+        self._scroll_area.setUpdatesEnabled(True)
+        self._schedule_geometry_update()
 
     def _load_history(self):
         """加载聊天历史记录
@@ -746,29 +967,27 @@ class CompactChatWindow(QWidget):
             print("[CompactChatWindow] 历史记录已加载或正在加载，跳过")
             return
 
-        self._history_loading = True
+        self._begin_batch_load()
 
         try:
-            # 显示已有的消息
-            messages = self._chat_history.get_messages()
+            # 显示已有的消息（只渲染最近 _display_limit 条）
+            messages = self._chat_history.get_messages(limit=self._display_limit)
             print(f"[CompactChatWindow] _load_history: 加载 {len(messages)} 条消息")
 
             for msg in messages:
                 self._display_message_from_history(msg)
 
             self._history_loaded = True
-            self._scroll_to_bottom()
 
         finally:
-            self._history_loading = False
+            self._finish_batch_load()
 
     def _display_message_from_history(self, msg: ChatMessage):
         """从历史记录中显示消息（不会再次添加到历史记录）"""
-        if msg.id in self._displayed_message_ids:
+        if msg.id in self._message_labels:
             return  # 已经显示过了
 
-        self._displayed_message_ids.add(msg.id)
-
+        label = None
         if msg.role == "user":
             # 用户消息
             if msg.msg_type == "image" and msg.file_path:
@@ -778,7 +997,7 @@ class CompactChatWindow(QWidget):
         else:
             # AI消息
             if msg.msg_type == "voice":
-                self._display_ai_voice(msg.content, msg.id)
+                self._display_ai_voice(msg.content, msg.id, msg)
             elif msg.msg_type == "video":
                 self._display_ai_video(msg.content, msg.id)
             elif msg.msg_type == "image":
@@ -789,68 +1008,41 @@ class CompactChatWindow(QWidget):
                 self._display_ai_file(msg.content, msg.id)
             else:
                 label = self._display_ai_text(msg.content, msg.id)
-                if label:
-                    self._message_labels[msg.id] = label
+
+        self._message_labels[msg.id] = label
 
     def _display_user_text(self, text: str):
         """显示用户文本消息（仅UI，不添加到历史）"""
-        container = QWidget()
-        container.setSizePolicy(
-            QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum
-        )
-        layout = QHBoxLayout(container)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(8)
+        container = self._acquire_row("user_text")
+        if container is None:
+            # 容器只承载气泡和头像，靠右由历史布局的对齐方式完成，不再需要弹性空间
+            container = QWidget()
+            layout = QHBoxLayout(container)
+            layout.setContentsMargins(0, 0, 0, 0)
+            layout.setSpacing(8)
+
+            # 文本气泡（样式由窗口样式表中的 QLabel#userBubble 提供）
+            lbl = QLabel()
+            lbl.setObjectName("userBubble")
+            lbl.setWordWrap(True)
+            lbl.setSizePolicy(QSizePolicy.Policy.Maximum, QSizePolicy.Policy.Minimum)
+            layout.addWidget(lbl)
+
+            # 用户头像（内容在每次使用时由 _apply_avatar 设置）
+            avatar = self._make_avatar_label()
+            layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
 
-        # 弹性空间，将内容推到右边
-        layout.addStretch()
+            container._pool_kind = "user_text"
+            container._content_label = lbl
+            container._avatar_label = avatar
 
-        # 文本气泡
-        lbl = QLabel(text)
-        lbl.setWordWrap(True)
-        lbl.setSizePolicy(QSizePolicy.Policy.Maximum, QSizePolicy.Policy.Minimum)
-        t = theme_manager.current_theme
-        c = (
-            theme_manager.get_current_colors()
-        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
-        # 抖音风格气泡：大圆角 + 右下角小圆角（尾巴效果）
-        lbl.setStyleSheet(f"""
-            QLabel {{
-                color: {c.bubble_user_text};
-                background-color: {c.bubble_user_bg};
-                border-radius: {t.border_radius_large}px;
-                border-bottom-right-radius: 4px;
-                padding: 12px 16px;
-                font-family: {t.font_family};
-                font-size: {t.font_size_base}px;
-            }}
-        """)
+        lbl = container._content_label
+        lbl.setText(text)
         # 最大宽度为窗口宽度的 70% 左右
         lbl.setMaximumWidth(int(self.width() * 0.7))
-        layout.addWidget(lbl)
-
-        # 用户头像
-        avatar = QLabel()
-        avatar.setFixedSize(32, 32)
-        avatar.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
-
-        if self._user_avatar_pixmap and not self._user_avatar_pixmap.isNull():
-            circular_avatar = self._create_circular_avatar(self._user_avatar_pixmap, 32)
-            avatar.setPixmap(circular_avatar)
-            avatar.setStyleSheet("background: transparent;")
-        else:
-            # 使用 SVG 图标作为默认头像
-            icon_pixmap = icon_manager.get_pixmap("user", c.text_inverse, 20)
-            avatar.setPixmap(icon_pixmap)
-            avatar.setStyleSheet(
-                f"font-size: 20px; background-color: {c.primary}; border-radius: 16px; color: white;"
-            )
-            avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self._apply_avatar(container._avatar_label, is_user=True)
 
-        layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
-
-        container.adjustSize()
-        self._add_to_history(container, is_image=False)
+        self._add_to_history(container, alignment=Qt.AlignmentFlag.AlignRight)
 
     def _display_user_image(self, image_path: str):
         """显示用户图片消息（仅UI，不添加到历史）"""
@@ -859,109 +1051,142 @@ class CompactChatWindow(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(8)
 
-        # 弹性空间
-        layout.addStretch()
-
         lbl = ClickableImageLabel(image_path)
-        container.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         layout.addWidget(lbl)
 
         # 用户头像
-        avatar = QLabel()
-        avatar.setFixedSize(32, 32)
-        avatar.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
-
-        c = (
-            theme_manager.get_current_colors()
-        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
-
-        if self._user_avatar_pixmap and not self._user_avatar_pixmap.isNull():
-            circular_avatar = self._create_circular_avatar(self._user_avatar_pixmap, 32)
-            avatar.setPixmap(circular_avatar)
-            avatar.setStyleSheet("background: transparent;")
-        else:
-            # 使用 SVG 图标作为默认头像
-            icon_pixmap = icon_manager.get_pixmap("user", c.text_inverse, 20)
-            avatar.setPixmap(icon_pixmap)
-            avatar.setStyleSheet(
-                f"font-size: 20px; background-color: {c.primary}; border-radius: 16px; color: white;"
-            )
-            avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        avatar = self._make_avatar_widget(is_user=True)
 
         layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
 
-        container.adjustSize()
-        # container.setFixedHeight(lbl.height()) # 移除固定高度，让布局自动适应
-
-        self._add_to_history(container, is_image=True)
+        self._add_to_history(
+            container, is_image=True, alignment=Qt.AlignmentFlag.AlignRight
+        )
 
     def _display_ai_text(
         self, text: str, message_id: str = ""
     ) -> Optional[MarkdownLabel]:
         """显示AI文本消息（仅UI，不添加到历史）"""
-        container = QWidget()
-        container.setSizePolicy(
-            QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Minimum
-        )
-        layout = QHBoxLayout(container)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(8)
+        container = self._acquire_row("ai_text")
+        if container is None:
+            container = QWidget()
+            container.setSizePolicy(
+                QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Minimum
+            )
+            layout = QHBoxLayout(container)
+            layout.setContentsMargins(0, 0, 0, 0)
+            layout.setSpacing(8)
 
-        t = theme_manager.current_theme
-        c = (
-            theme_manager.get_current_colors()
-        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
+            # 机器人头像（内容在每次使用时由 _apply_avatar 设置）
+            avatar = self._make_avatar_label()
+            layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
 
-        # 机器人头像
-        avatar = QLabel()
-        avatar.setFixedSize(32, 32)
-        avatar.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+            # 气泡容器（样式由窗口样式表中的 QFrame#aiBubble 提供）
+            bubble_frame = QFrame()
+            bubble_frame.setObjectName("aiBubble")
+            bubble_layout = QVBoxLayout(bubble_frame)
+            bubble_layout.setContentsMargins(12, 10, 12, 10)
+            bubble_layout.setSpacing(0)
 
-        if self._bot_avatar_pixmap and not self._bot_avatar_pixmap.isNull():
-            circular_avatar = self._create_circular_avatar(self._bot_avatar_pixmap, 32)
-            avatar.setPixmap(circular_avatar)
-            avatar.setStyleSheet("background: transparent;")
-        else:
-            # 使用 SVG 图标作为默认头像
-            icon_pixmap = icon_manager.get_pixmap("bot", c.text_primary, 20)
-            avatar.setPixmap(icon_pixmap)
-            avatar.setStyleSheet(
-                f"font-size: 20px; background-color: {c.bg_tertiary}; border-radius: 16px;"
+            md_label = MarkdownLabel(parent=bubble_frame)
+            md_label.setSizePolicy(
+                QSizePolicy.Policy.Maximum, QSizePolicy.Policy.Minimum
             )
-            avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            bubble_layout.addWidget(md_label)
 
-        layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
+            layout.addWidget(bubble_frame)
+            layout.addStretch()
 
-        # 气泡容器 - 抖音风格大圆角 + 左下角小圆角（尾巴效果）
-        bubble_frame = QFrame()
-        bubble_frame.setObjectName("aiBubble")
-        bubble_frame.setStyleSheet(f"""
-            QFrame#aiBubble {{
-                background-color: {c.bubble_ai_bg};
-                border: 1px solid {c.bubble_ai_border};
-                border-radius: {t.border_radius_large}px;
-                border-bottom-left-radius: 4px;
-                padding: 0px;
-            }}
-        """)
-        bubble_layout = QVBoxLayout(bubble_frame)
-        bubble_layout.setContentsMargins(12, 10, 12, 10)
-        bubble_layout.setSpacing(0)
+            container._pool_kind = "ai_text"
+            container._content_label = md_label
+            container._avatar_label = avatar
 
-        md_label = MarkdownLabel(text, parent=bubble_frame)
+        container._message_id = message_id
+        self._apply_avatar(container._avatar_label, is_user=False)
+        md_label = container._content_label
         # 最大宽度为窗口宽度的 70%
         md_label.setMaximumWidth(int(self.width() * 0.70))
-        md_label.setSizePolicy(QSizePolicy.Policy.Maximum, QSizePolicy.Policy.Minimum)
-        bubble_layout.addWidget(md_label)
-
-        layout.addWidget(bubble_frame)
-        layout.addStretch()
-        container.adjustSize()
+        md_label.set_markdown(text)
 
         self._add_to_history(container)
 
         return md_label
 
+    @staticmethod
+    def _make_avatar_label() -> QLabel:
+        """创建 32px 的空头像标签"""
+        avatar = QLabel()
+        avatar.setFixedSize(32, 32)
+        avatar.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        return avatar
+
+    def _make_avatar_widget(self, is_user: bool) -> QLabel:
+        """创建已设置好当前用户/机器人头像的 32px 头像标签"""
+        avatar = self._make_avatar_label()
+        self._apply_avatar(avatar, is_user)
+        return avatar
+
+    def _apply_avatar(self, avatar: QLabel, is_user: bool):
+        """为头像标签设置当前的用户/机器人头像"""
+        pixmap = self._user_avatar_pixmap if is_user else self._bot_avatar_pixmap
+        if pixmap and not pixmap.isNull():
+            avatar.setPixmap(self._get_circular_avatar(is_user=is_user, size=32))
+            name = "avatarImage"
+        else:
+            c = (
+                theme_manager.get_current_colors()
+            )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
+            # 使用 SVG 图标作为默认头像
+            if is_user:
+                avatar.setPixmap(icon_manager.get_pixmap("user", c.text_inverse, 20))
+            else:
+                avatar.setPixmap(icon_manager.get_pixmap("bot", c.text_primary, 20))
+            avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            name = "userAvatarFallback" if is_user else "botAvatarFallback"
+        self._set_avatar_style_name(avatar, name)
+
+    @staticmethod
+    def _set_avatar_style_name(avatar: QLabel, name: str):
+        """设置头像标签的 objectName（对应窗口样式表中的头像样式）
+
+        对象池复用的标签名称未变化时不做处理；变化时重新 polish 使新样式生效。
+        """
+        if avatar.objectName() == name:
+            return
+        avatar.setObjectName(name)
+        style = avatar.style()
+        style.unpolish(avatar)
+        style.polish(avatar)
+
+    def _acquire_row(self, kind: str) -> Optional[QWidget]:
+        """从对象池取出一个可复用的消息行，池为空时返回 None"""
+        pool = self._row_pool[kind]
+        if not pool:
+            return None
+        return pool.pop()
+
+    def _release_row(self, row: QWidget):
+        """回收被移出历史的消息行，不可复用的行直接销毁"""
+        kind = getattr(row, "_pool_kind", None)
+        if kind is None or len(self._row_pool[kind]) >= self._max_history:
+            row.deleteLater()
+            return
+
+        if kind == "ai_text":
+            # 旧消息不再指向将被复用的标签，避免后续更新写到新消息上
+            md_label = row._content_label
+            message_id = getattr(row, "_message_id", "")
+            if self._message_labels.get(message_id) is md_label:
+                self._message_labels[message_id] = None
+                self._pending_md_updates.pop(message_id, None)
+            if self._current_ai_label is md_label:
+                self._current_ai_label = None
+
+        # 暂存在窗口下（隐藏），重建消息容器时不会被一并销毁
+        row.hide()
+        row.setParent(self)
+        self._row_pool[kind].append(row)
+
     def _display_ai_image(self, image_path: str, message_id: str = ""):
         """显示AI图片消息"""
         container = QWidget()
@@ -971,26 +1196,7 @@ class CompactChatWindow(QWidget):
         layout.setSpacing(4)
 
         # 机器人头像
-        avatar = QLabel()
-        avatar.setFixedSize(32, 32)
-        avatar.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
-
-        c = (
-            theme_manager.get_current_colors()
-        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
-
-        if self._bot_avatar_pixmap and not self._bot_avatar_pixmap.isNull():
-            circular_avatar = self._create_circular_avatar(self._bot_avatar_pixmap, 32)
-            avatar.setPixmap(circular_avatar)
-            avatar.setStyleSheet("background: transparent;")
-        else:
-            # 使用 SVG 图标作为默认头像
-            icon_pixmap = icon_manager.get_pixmap("bot", c.text_primary, 20)
-            avatar.setPixmap(icon_pixmap)
-            avatar.setStyleSheet(
-                f"font-size: 20px; background-color: {c.bg_tertiary}; border-radius: 16px;"
-            )
-            avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        avatar = self._make_avatar_widget(is_user=False)
 
         layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
 
@@ -1017,26 +1223,7 @@ class CompactChatWindow(QWidget):
         layout.setSpacing(4)
 
         # 机器人头像
-        avatar = QLabel()
-        avatar.setFixedSize(32, 32)
-        avatar.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
-
-        c = (
-            theme_manager.get_current_colors()
-        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
-
-        if self._bot_avatar_pixmap and not self._bot_avatar_pixmap.isNull():
-            circular_avatar = self._create_circular_avatar(self._bot_avatar_pixmap, 32)
-            avatar.setPixmap(circular_avatar)
-            avatar.setStyleSheet("background: transparent;")
-        else:
-            # 使用 SVG 图标作为默认头像
-            icon_pixmap = icon_manager.get_pixmap("bot", c.text_primary, 20)
-            avatar.setPixmap(icon_pixmap)
-            avatar.setStyleSheet(
-                f"font-size: 20px; background-color: {c.bg_tertiary}; border-radius: 16px;"
-            )
-            avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        avatar = self._make_avatar_widget(is_user=False)
 
         layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
 
@@ -1047,6 +1234,21 @@ class CompactChatWindow(QWidget):
 
         self._add_to_history(container)
 
+    def _audio_file_exists(self, audio_path: str) -> bool:
+        """检查音频文件是否存在
+
+        存在的结果缓存 _AUDIO_EXISTS_TTL 秒，重新加载历史时不再重复访问磁盘。
+        """
+        now = time.monotonic()
+        checked_at = self._audio_exists_cache.get(audio_path)
+        if checked_at is not None and now - checked_at < _AUDIO_EXISTS_TTL:
+            return True
+        if os.path.exists(audio_path):
+            self._audio_exists_cache[audio_path] = now
+            return True
+        self._audio_exists_cache.pop(audio_path, None)
+        return False
+
     def _display_ai_video(self, content: str, message_id: str = ""):
         """显示AI视频消息（仅UI，不添加到历史）"""
         # 解析内容: path|thumbnail|duration
@@ -1064,26 +1266,7 @@ class CompactChatWindow(QWidget):
         layout.setSpacing(4)
 
         # 机器人头像
-        avatar = QLabel()
-        avatar.setFixedSize(32, 32)
-        avatar.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
-
-        c = (
-            theme_manager.get_current_colors()
-        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
-
-        if self._bot_avatar_pixmap and not self._bot_avatar_pixmap.isNull():
-            circular_avatar = self._create_circular_avatar(self._bot_avatar_pixmap, 32)
-            avatar.setPixmap(circular_avatar)
-            avatar.setStyleSheet("background: transparent;")
-        else:
-            # 使用 SVG 图标作为默认头像
-            icon_pixmap = icon_manager.get_pixmap("bot", c.text_primary, 20)
-            avatar.setPixmap(icon_pixmap)
-            avatar.setStyleSheet(
-                f"font-size: 20px; background-color: {c.bg_tertiary}; border-radius: 16px;"
-            )
-            avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        avatar = self._make_avatar_widget(is_user=False)
 
         layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
 
@@ -1094,24 +1277,34 @@ class CompactChatWindow(QWidget):
         layout.addWidget(video_widget)
 
         layout.addStretch()
-        container.adjustSize()
 
         self._add_to_history(container)
 
-    def _display_ai_voice(self, content: str, message_id: str = ""):
+    def _display_ai_voice(
+        self,
+        content: str,
+        message_id: str = "",
+        message: Optional[ChatMessage] = None,
+    ):
         """显示AI语音消息（仅UI，不添加到历史）
 
         Args:
             content: 格式为 "audio_path|duration" 或仅 "audio_path"
             message_id: 消息ID
+            message: 对应的历史消息，提供时复用其缓存的解析结果
         """
         # 解析内容获取音频路径和时长
-        parts = content.split("|")
-        audio_path = parts[0].strip()
-        duration = float(parts[1]) if len(parts) > 1 else 0
+        if message is not None:
+            audio_path = message.audio_path
+            duration = message.audio_duration
+        else:
+            path_text, _, rest = content.partition("|")
+            audio_path = path_text.strip()
+            duration_text = rest.partition("|")[0]
+            duration = float(duration_text) if duration_text else 0
 
         # 验证音频路径存在
-        if not audio_path or not os.path.exists(audio_path):
+        if not audio_path or not self._audio_file_exists(audio_path):
             # 如果路径无效，显示为文本消息
             self._display_ai_text(f"🔊 [语音消息: {audio_path}]", message_id)
             return
@@ -1125,26 +1318,7 @@ class CompactChatWindow(QWidget):
         layout.setSpacing(4)
 
         # 机器人头像
-        avatar = QLabel()
-        avatar.setFixedSize(32, 32)
-        avatar.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
-
-        c = (
-            theme_manager.get_current_colors()
-        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
-
-        if self._bot_avatar_pixmap and not self._bot_avatar_pixmap.isNull():
-            circular_avatar = self._create_circular_avatar(self._bot_avatar_pixmap, 32)
-            avatar.setPixmap(circular_avatar)
-            avatar.setStyleSheet("background: transparent;")
-        else:
-            # 使用 SVG 图标作为默认头像
-            icon_pixmap = icon_manager.get_pixmap("bot", c.text_primary, 20)
-            avatar.setPixmap(icon_pixmap)
-            avatar.setStyleSheet(
-                f"font-size: 20px; background-color: {c.bg_tertiary}; border-radius: 16px;"
-            )
-            avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        avatar = self._make_avatar_widget(is_user=False)
 
         layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
 
@@ -1153,17 +1327,16 @@ class CompactChatWindow(QWidget):
         layout.addWidget(voice_widget)
 
         layout.addStretch()
-        container.adjustSize()
 
         self._add_to_history(container)
 
     def _on_history_message_added(self, msg: ChatMessage):
         """处理历史记录管理器发出的消息添加信号"""
-        if msg.id in self._displayed_message_ids:
+        if msg.id in self._message_labels:
             return
 
+        # 滚动由 _add_to_history 调度的几何更新统一完成
         self._display_message_from_history(msg)
-        self._scroll_to_bottom()
 
         # 自动播放语音逻辑
         if msg.role == "assistant" and msg.msg_type == "voice":
@@ -1183,9 +1356,9 @@ class CompactChatWindow(QWidget):
 
             if should_play:
                 # 查找最后添加的 widget (它是 container，包含 voice_widget)
-                if self._history_layout.count() > 1:
+                if self._history_layout.count() > 0:
                     container_item = self._history_layout.itemAt(
-                        self._history_layout.count() - 2
+                        self._history_layout.count() - 1
                     )
                     if container_item:
                         container = container_item.widget()
@@ -1197,25 +1370,40 @@ class CompactChatWindow(QWidget):
     def _on_history_message_updated(self, message_id: str, new_content: str):
         """处理历史记录管理器发出的消息更新信号"""
         # 如果是当前正在流式响应的消息，更新MarkdownLabel
-        if message_id in self._message_labels:
-            label = self._message_labels[message_id]
+        # 流式响应每个片段都会触发，合并后由定时器统一重新渲染
+        if self._message_labels.get(message_id) is not None:
+            self._pending_md_updates[message_id] = new_content
+            if not self._md_update_timer.isActive():
+                self._md_update_timer.start()
+
+    def _flush_markdown_updates(self):
+        """渲染合并后的消息更新，每条消息只渲染最新内容"""
+        pending = self._pending_md_updates
+        self._pending_md_updates = {}
+        updated = False
+        for message_id, content in pending.items():
+            label = self._message_labels.get(message_id)
             if label and isinstance(label, MarkdownLabel):
-                label.set_markdown(new_content)
-                self._scroll_to_bottom()
+                label.set_markdown(content)
+                updated = True
+        if updated:
+            # 标签高度在渲染后才调整，稍后再统一滚动
+            self._schedule_geometry_update()
 
     def _on_history_cleared(self):
         """处理历史记录清除信号"""
-        # 清空所有显示的消息（保留索引 0 的 stretch）
-        while self._history_layout.count() > 1:  # 保留 stretch
-            item = self._history_layout.itemAt(1)  # 从索引 1 开始删除，保留 stretch
-            if item:
-                w = item.widget()
-                if w is not None:
-                    self._history_layout.removeWidget(w)
-                    w.deleteLater()
-
-        self._displayed_message_ids.clear()
+        # 清空所有显示的消息：整体替换消息容器
+        self._reset_history_widget()
+        self._display_limit = self._max_history
+        self._scroll_restore_from_bottom = None
+        # 历史已清空，暂存的消息行短期内用不到，一并释放
+        for pool in self._row_pool.values():
+            for row in pool:
+                row.deleteLater()
+            pool.clear()
+
         self._message_labels.clear()
+        self._pending_md_updates.clear()
         self._current_ai_label = None
         self._current_ai_message_id = ""
         self._update_geometry()
@@ -1229,7 +1417,7 @@ class CompactChatWindow(QWidget):
         """
         # 如果已经加载过且当前有显示内容，跳过重复加载
         # 这可以防止某些意外情况下的重复加载
-        if self._history_loaded and self._displayed_message_ids:
+        if self._history_loaded and self._message_labels:
             print("[CompactChatWindow] 历史已加载且有显示内容，跳过重复加载")
             return
 
@@ -1241,25 +1429,69 @@ class CompactChatWindow(QWidget):
         # 调用 reload_history_display 来重新加载
         self.reload_history_display()
 
+    def _connect_sources(self):
+        """注册主题回调并连接聊天记录管理器的信号"""
+        if self._sources_connected:
+            return
+        self._sources_connected = True
+        theme_manager.register_callback(self._on_theme_changed)
+        self._chat_history.message_added.connect(self._on_history_message_added)
+        self._chat_history.message_updated.connect(self._on_history_message_updated)
+        self._chat_history.messages_cleared.connect(self._on_history_cleared)
+        self._chat_history.history_loaded.connect(self._on_history_loaded)
+
+    def _disconnect_sources(self):
+        """取消主题回调并断开聊天记录管理器的信号
+
+        避免已关闭的窗口继续接收消息，回调随窗口打开次数不断累积。
+        """
+        if not self._sources_connected:
+            return
+        self._sources_connected = False
+        theme_manager.unregister_callback(self._on_theme_changed)
+        self._chat_history.message_added.disconnect(self._on_history_message_added)
+        self._chat_history.message_updated.disconnect(
+            self._on_history_message_updated
+        )
+        self._chat_history.messages_cleared.disconnect(self._on_history_cleared)
+        self._chat_history.history_loaded.disconnect(self._on_history_loaded)
+
+    def closeEvent(self, event):
+        self.flush_pending_save()
+        self._disconnect_sources()
+        super().closeEvent(event)
+
     def _on_close(self):
+        self.flush_pending_save()
         self.hide()
         self.closed.emit()
 
+    def flush_pending_save(self):
+        """立即执行尚未触发的延迟保存"""
+        if self._save_timer.isActive():
+            self._save_timer.stop()
+            self._chat_history.save_to_file()
+
     def set_attachment(self, path: str):
         if not path or not os.path.exists(path):
             return
         self._attachment_path = path
-        pixmap = QPixmap(path)
-        if not pixmap.isNull():
-            self._preview_label.setPixmap(
-                pixmap.scaled(
-                    100,
-                    40,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation,
-                )
+        # 缩放后的预览图按文件缓存，重复附加同一图片时不再解码和平滑缩放
+        key = f"attachment_preview:{self._avatar_cache_key(path)}"
+        preview = QPixmapCache.find(key)
+        if preview is None or preview.isNull():
+            pixmap = QPixmap(path)
+            if pixmap.isNull():
+                return
+            preview = pixmap.scaled(
+                100,
+                40,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
             )
-            self._preview_frame.setVisible(True)
+            QPixmapCache.insert(key, preview)
+        self._preview_label.setPixmap(preview)
+        self._preview_frame.setVisible(True)
 
     def clear_attachment(self):
         self._attachment_path = None
@@ -1354,17 +1586,21 @@ class CompactChatWindow(QWidget):
             msg = self._chat_history.add_message(
                 role="user", content=text, msg_type="image", file_path=image_path
             )
-            if msg.id not in self._displayed_message_ids:
-                self._displayed_message_ids.add(msg.id)
-                self._display_user_image(image_path)
         else:
             # 添加文本消息
             msg = self._chat_history.add_message(
                 role="user", content=text, msg_type="text"
             )
-            if msg.id not in self._displayed_message_ids:
-                self._displayed_message_ids.add(msg.id)
-                self._display_user_text(text)
+        self._show_new_message(msg)
+
+    def _show_new_message(self, msg: ChatMessage) -> Optional[MarkdownLabel]:
+        """确保刚添加到历史记录的消息已显示，返回其 MarkdownLabel
+
+        message_added 信号是同步发出的，窗口连接着信号时消息已经显示，
+        这里只取回对应的标签；信号断开时才补充显示。
+        """
+        self._display_message_from_history(msg)
+        return self._message_labels.get(msg.id)
 
     def _create_circular_avatar(self, pixmap: QPixmap, size: int = 24) -> QPixmap:
         """创建圆形头像（支持高 DPI）"""
@@ -1389,21 +1625,18 @@ class CompactChatWindow(QWidget):
             y = (scaled_source.height() - actual_size) // 2
             scaled_source = scaled_source.copy(x, y, actual_size, actual_size)
         
-        rounded_pixmap = QPixmap(actual_size, actual_size)
-        rounded_pixmap.fill(Qt.GlobalColor.transparent)
-
-        painter = QPainter(rounded_pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-
-        # 绘制圆形裁剪路径
-        path = QPainterPath()
-        path.addEllipse(0, 0, actual_size, actual_size)
-        painter.setClipPath(path)
+        # 在预乘 alpha 图像上绘制头像，再用缓存的圆形遮罩做 DestinationIn 合成，
+        # 避免逐像素的裁剪路径
+        image = QImage(actual_size, actual_size, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.transparent)
 
-        # 绘制头像
+        painter = QPainter(image)
         painter.drawPixmap(0, 0, actual_size, actual_size, scaled_source)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationIn)
+        painter.drawImage(0, 0, _circle_mask(actual_size))
         painter.end()
 
+        rounded_pixmap = QPixmap.fromImage(image)
         # 设置设备像素比，确保高 DPI 显示正确
         rounded_pixmap.setDevicePixelRatio(dpr)
         return rounded_pixmap
@@ -1422,20 +1655,21 @@ class CompactChatWindow(QWidget):
                 # 语音消息需要特殊处理：删除占位消息的MarkdownLabel，显示语音组件
                 self._replace_waiting_with_voice(text)
             else:
-                # 文本消息：直接更新占位消息的内容
+                # 文本消息：最终内容取代已累积的流式片段，立即写入并渲染
+                self._stream_flush_timer.stop()
+                self._current_ai_message = text
                 self._chat_history.update_message(self._current_ai_message_id, text)
-                if self._current_ai_label:
-                    self._current_ai_label.set_markdown(text)
+                self._render_current_ai_label(text)
 
+            label = self._current_ai_label
             self.finish_response()
-            return self._current_ai_label
+            return label
 
         # 没有等待中的消息，正常添加新消息
         # 解析语音消息的文件路径
         file_path = ""
         if msg_type == "voice":
-            parts = text.split("|")
-            file_path = parts[0] if parts else ""
+            file_path = text.partition("|")[0]
 
         # 添加到历史记录
         msg = self._chat_history.add_message(
@@ -1443,18 +1677,7 @@ class CompactChatWindow(QWidget):
         )
 
         # 显示消息
-        if msg.id not in self._displayed_message_ids:
-            self._displayed_message_ids.add(msg.id)
-            if msg_type == "voice":
-                self._display_ai_voice(text, msg.id)
-                return None
-            else:
-                label = self._display_ai_text(text, msg.id)
-                if label:
-                    self._message_labels[msg.id] = label
-                return label
-
-        return None
+        return self._show_new_message(msg)
 
     def _replace_waiting_with_voice(self, content: str):
         """将等待中的占位消息替换为语音消息组件
@@ -1469,30 +1692,26 @@ class CompactChatWindow(QWidget):
         # 由于 ChatHistoryManager.update_message 只更新内容，我们需要删除旧消息并添加新消息
         # 但为了简化，我们先更新内容，然后在UI层做替换
 
-        # 解析音频路径
-        parts = content.split("|")
-        parts[0].strip()
-
         # 更新历史记录
         self._chat_history.update_message(self._current_ai_message_id, content)
 
         # 找到并删除占位消息的UI组件
         if self._current_ai_label:
-            # 找到包含这个label的container widget
-            parent_obj = self._current_ai_label.parent()
-            if parent_obj and isinstance(parent_obj, QWidget):
-                parent_widget = parent_obj
+            # 沿父级向上找到历史容器的直接子组件（即这条消息的 container）
+            container = self._current_ai_label
+            while (
+                container is not None
+                and container.parentWidget() is not self._history_widget
+            ):
+                container = container.parentWidget()
+            if container is not None:
                 # 从历史layout中移除
-                for i in range(self._history_layout.count()):
-                    item = self._history_layout.itemAt(i)
-                    if item and item.widget() == parent_widget:
-                        self._history_layout.removeWidget(parent_widget)
-                        parent_widget.deleteLater()
-                        break
-
-            # 从映射中删除
+                self._history_layout.removeWidget(container)
+                container.deleteLater()
+
+            # 消息改为语音组件显示，不再有对应的 MarkdownLabel
             if self._current_ai_message_id in self._message_labels:
-                del self._message_labels[self._current_ai_message_id]
+                self._message_labels[self._current_ai_message_id] = None
 
             self._current_ai_label = None
 
@@ -1534,18 +1753,14 @@ class CompactChatWindow(QWidget):
             )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
 
             if self._bot_avatar_pixmap and not self._bot_avatar_pixmap.isNull():
-                circular_avatar = self._create_circular_avatar(
-                    self._bot_avatar_pixmap, 24
-                )
+                circular_avatar = self._get_circular_avatar(is_user=False, size=24)
                 avatar.setPixmap(circular_avatar)
-                avatar.setStyleSheet("background: transparent;")
+                avatar.setObjectName("avatarImage")
             else:
                 # 使用 SVG 图标作为默认头像
                 icon_pixmap = icon_manager.get_pixmap("bot", c.text_primary, 16)
                 avatar.setPixmap(icon_pixmap)
-                avatar.setStyleSheet(
-                    f"font-size: 16px; background-color: {c.bg_tertiary}; border-radius: 12px;"
-                )
+                avatar.setObjectName("botAvatarFallbackSmall")
 
             layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignTop)
 
@@ -1554,33 +1769,100 @@ class CompactChatWindow(QWidget):
             layout.addWidget(voice_widget)
             layout.addStretch()
 
-        container.adjustSize()
         self._add_to_history(container)
 
-    def _add_to_history(self, widget: QWidget, is_image: bool = False):
-        # 设置widget的大小策略（图片消息保持 Fixed 高度）
-        if not is_image:
+    def _add_to_history(
+        self,
+        widget: QWidget,
+        is_image: bool = False,
+        alignment: Optional[Qt.AlignmentFlag] = None,
+    ):
+        if alignment is not None:
+            # 按对齐方式放置的消息（用户消息靠右）保持紧凑尺寸
+            widget.setSizePolicy(QSizePolicy.Policy.Maximum, QSizePolicy.Policy.Minimum)
+        elif not is_image:
+            # 设置widget的大小策略（图片消息保持 Fixed 高度）
             widget.setSizePolicy(
                 QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum
             )
         # 如果是图片消息，保留其 Fixed 高度策略
         # widget.setMaximumWidth(340)  # 限制最大宽度，避免横向滚动条
 
-        # 直接添加到布局末尾（stretch 在开头，消息在后面）
-        self._history_layout.addWidget(widget)
-
-        # 限制历史数量（从 stretch 后的第一个 widget 开始删除，即索引 1）
-        while self._history_layout.count() > self._max_history + 1:  # +1 for stretch
-            item = self._history_layout.itemAt(1)  # 跳过 stretch（索引 0）
-            if item:
-                w = item.widget()
-                if w:
-                    self._history_layout.removeWidget(w)
-                    w.deleteLater()
+        # 直接添加到布局末尾
+        if alignment is not None:
+            self._history_layout.addWidget(widget, alignment=alignment)
+        else:
+            self._history_layout.addWidget(widget)
+        # 从对象池取出的行之前被隐藏过，需要显式显示
+        widget.show()
+
+        if not self._history_loading:
+            # 新消息会滚动到底部：恢复显示数量上限，之前加载的更早消息随之移除
+            self._display_limit = self._max_history
+            self._scroll_restore_from_bottom = None
+
+        # 限制历史数量（从最早的消息开始移除，文本消息行回收到对象池）
+        # 直接取出首项，不再经 removeWidget 在布局中逐项查找
+        while self._history_layout.count() > self._display_limit:
+            item = self._history_layout.takeAt(0)
+            w = item.widget() if item else None
+            if w:
+                self._release_row(w)
+
+        # 批量加载历史时由 _finish_batch_load 统一更新
+        if self._history_loading:
+            return
 
         # 延迟更新布局，确保widget已完成布局
-        QTimer.singleShot(10, self._update_geometry)
-        QTimer.singleShot(50, self._scroll_to_bottom)
+        self._schedule_geometry_update()
+
+    def _schedule_geometry_update(self):
+        """合并短时间内的多次请求，只调整一次几何尺寸并滚动"""
+        if not self._geom_timer.isActive():
+            self._geom_timer.start()
+
+    def _update_geometry_and_scroll(self):
+        self._update_geometry()
+        if self._scroll_restore_from_bottom is not None:
+            scrollbar = self._scroll_area.verticalScrollBar()
+            scrollbar.setValue(scrollbar.maximum() - self._scroll_restore_from_bottom)
+        else:
+            self._scroll_to_bottom()
+
+    def _on_scroll_range_changed(self, minimum: int, maximum: int):
+        """内容高度变化（如换行后的标签高度确定）时继续保持距底部的位置"""
+        if self._scroll_restore_from_bottom is not None:
+            self._scroll_area.verticalScrollBar().setValue(
+                maximum - self._scroll_restore_from_bottom
+            )
+
+    def _on_scroll_action(self, action: int):
+        """用户主动滚动后不再保持加载前的位置"""
+        self._scroll_restore_from_bottom = None
+
+    def _check_hydration_needed(self, value: int):
+        """用户滚动到顶部时加载更早的消息"""
+        # 加载中、等待布局更新或保持位置时的滚动值变化来自程序本身，忽略
+        if (
+            self._history_loading
+            or self._geom_timer.isActive()
+            or self._scroll_restore_from_bottom is not None
+            or not self._history_loaded
+        ):
+            return
+        if value == 0:
+            maximum = self._scroll_area.verticalScrollBar().maximum()
+            if (
+                maximum > 0
+                and self._chat_history.get_message_count() > self._display_limit
+            ):
+                self._hydrate_older(maximum)
+
+    def _hydrate_older(self, from_bottom: int):
+        """多显示 _HYDRATE_BATCH 条更早的消息，并保持当前可见内容的位置不变"""
+        self._display_limit += _HYDRATE_BATCH
+        self._scroll_restore_from_bottom = from_bottom
+        self.reload_history_display()
 
     def _update_geometry(self):
         """根据内容自适应调整窗口高度（仅在未手动调整大小时）"""
@@ -1609,7 +1891,10 @@ class CompactChatWindow(QWidget):
 
     def _scroll_to_bottom(self):
         scrollbar = self._scroll_area.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+        maximum = scrollbar.maximum()
+        # 已在底部时不再触发滚动
+        if scrollbar.value() != maximum:
+            scrollbar.setValue(maximum)
 
     def update_streaming_response(self, content: str):
         """更新流式响应"""
@@ -1622,21 +1907,31 @@ class CompactChatWindow(QWidget):
             )
             self._current_ai_message_id = msg.id
 
-            # 显示消息
-            if msg.id not in self._displayed_message_ids:
-                self._displayed_message_ids.add(msg.id)
-                label = self._display_ai_text(content, msg.id)
-                if label:
-                    self._current_ai_label = label
-                    self._message_labels[msg.id] = label
-        else:
-            # 更新历史记录中的消息
-            self._chat_history.update_message(self._current_ai_message_id, self._current_ai_message)
-            # 直接更新当前label
-            if self._current_ai_label:
-                self._current_ai_label.set_markdown(self._current_ai_message)
+            # 显示消息（滚动随几何更新延迟进行）
+            self._current_ai_label = self._show_new_message(msg)
+        elif not self._stream_flush_timer.isActive():
+            # 后续片段只累积，由定时器按固定节奏写入历史记录并刷新界面
+            self._stream_flush_timer.start()
 
-        self._scroll_to_bottom()
+    def _flush_stream(self):
+        """把累积的流式内容写入历史记录，并立即刷新当前消息"""
+        if not self._current_ai_message_id:
+            return
+        self._chat_history.update_message(
+            self._current_ai_message_id, self._current_ai_message
+        )
+        self._render_current_ai_label(self._current_ai_message)
+
+    def _render_current_ai_label(self, text: str):
+        """直接渲染当前流式消息持有的标签
+
+        当前消息的标签已由 _current_ai_label 持有，不必经过待渲染队列和
+        _message_labels 查找；message_updated 信号登记的同一内容随之丢弃。
+        """
+        self._pending_md_updates.pop(self._current_ai_message_id, None)
+        if self._current_ai_label is not None:
+            self._current_ai_label.set_markdown(text)
+            self._schedule_geometry_update()
 
     def _on_attach_clicked(self):
         """点击附件按钮"""
@@ -1751,17 +2046,16 @@ class CompactChatWindow(QWidget):
         # self._input.setEnabled(True)
         # self._input.setFocus()
 
-        # 保存最终内容
-        if self._current_ai_message_id and self._current_ai_message:
-            self._chat_history.update_message(
-                self._current_ai_message_id, self._current_ai_message
-            )
+        # 保存尚未按节奏写入的流式片段（没有待写入内容时历史记录已是最新）
+        if self._stream_flush_timer.isActive():
+            self._stream_flush_timer.stop()
+            self._flush_stream()
 
         self._current_ai_label = None
         self._current_ai_message_id = ""
 
-        # 确保保存
-        self._chat_history.save_to_file()
+        # 确保保存（延迟合并，窗口关闭时立即写入）
+        self._save_timer.start()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Escape:
@@ -1797,6 +2091,11 @@ class CompactChatWindow(QWidget):
 
     def showEvent(self, event):
         super().showEvent(event)
+        if not self._sources_connected:
+            # 关闭后重新打开：恢复连接，并重新加载关闭期间错过的消息
+            self._connect_sources()
+            self._history_loaded = False
+            QTimer.singleShot(0, self.reload_history_display)
         self._input.setFocus()
         QTimer.singleShot(100, self._scroll_to_bottom)
 
@@ -1809,6 +2108,38 @@ class CompactChatWindow(QWidget):
             self._auto_hide_timer.start(self._auto_hide_duration)
 
 
+# 悬浮球绘制中不随帧变化的颜色和画笔，避免每帧重新创建
+_BALL_HIGHLIGHT_COLOR = QColor(255, 255, 255, 80)
+_BALL_DISCONNECTED_MASK = QColor(0, 0, 0, 100)
+_UNREAD_DOT_COLOR = QColor(255, 80, 80)
+_UNREAD_DOT_PEN = QPen(QColor(255, 255, 255, 200), 2)
+_HOVER_BORDER_PEN = QPen(QColor(255, 255, 255, 150), 2)
+# 外发光各圈的 (向外扩展的像素, 透明度系数)
+_GLOW_RINGS = tuple((i, 1 - i / 12) for i in range(10, 0, -2))
+# 右键菜单样式表模板，按主题颜色通过 format_map 填充
+_MENU_STYLE_TEMPLATE = """
+            QMenu {{
+                background-color: {bg_primary};
+                border: 1px solid {border_light};
+                border-radius: 8px;
+                padding: 6px;
+            }}
+            QMenu::item {{
+                padding: 8px 20px 8px 12px;
+                border-radius: 4px;
+                color: {text_primary};
+            }}
+            QMenu::item:selected {{
+                background-color: {bg_hover};
+            }}
+            QMenu::separator {{
+                height: 1px;
+                background-color: {border_light};
+                margin: 4px 8px;
+            }}
+        """
+
+
 class FloatingBallWindow(QWidget):
     """美化版悬浮球窗口"""
 
@@ -1857,18 +2188,67 @@ class FloatingBallWindow(QWidget):
 
         # 拖拽状态
         self._dragging = False
-        self._drag_start_pos = QPoint()
-        self._click_timer = QTimer()
+        # 按下点相对窗口左上角的偏移（整数坐标，拖拽时不再构造 QPoint）
+        self._drag_offset_x = 0
+        self._drag_offset_y = 0
+        # 单击延迟定时器：运行中即表示有待确认的单击，超时才发出 clicked
+        self._click_timer = QTimer(self)
         self._click_timer.setSingleShot(True)
+        # 单击延迟不需要毫秒级精度，避免提高系统定时器精度
+        self._click_timer.setTimerType(Qt.TimerType.CoarseTimer)
         self._click_timer.timeout.connect(self._on_single_click)
-        self._pending_click = False
         self._drag_threshold = 5  # 拖拽阈值
-        self._double_click_interval = 300  # 双击检测间隔（毫秒）
+        self._drag_threshold_sq = self._drag_threshold * self._drag_threshold
+        self._press_x = 0  # 按下时的全局坐标
+        self._press_y = 0
+        self._has_moved_significantly = False  # 本次按下后是否已超过拖拽阈值
+        # 双击检测间隔（毫秒），与系统设置保持一致，和 mouseDoubleClickEvent 的判定相同
+        self._double_click_interval = QApplication.doubleClickInterval()
         self._last_release_time = 0  # 上次释放时间（用于双击检测）
+        # 拖拽移动节流：两次移动之间至少间隔一个定时器周期，期间只记录最新位置
+        self._pending_pos: Optional[Tuple[int, int]] = None
+        self._drag_move_timer = QTimer(self)
+        self._drag_move_timer.setSingleShot(True)
+        self._drag_move_timer.setTimerType(Qt.TimerType.CoarseTimer)
+        self._drag_move_timer.setInterval(8)
+        self._drag_move_timer.timeout.connect(self._flush_drag_move)
+
+        # 右键菜单（首次使用时创建，之后复用）
+        self._context_menu: Optional[QMenu] = None
+        self._theme_menu: Optional[QMenu] = None
+        # 主题子菜单当前对应的主题列表，列表变化时才重建子菜单项
+        self._theme_menu_names: Optional[list] = None
+        # 需要按主题着色的菜单项 [(动作, 图标名, 颜色属性名), ...]
+        self._menu_icon_actions: List[Tuple[QAction, str, str]] = []
+        # 主题变化后置脏，下次打开菜单时才重新应用样式和图标
+        self._menu_theme_dirty = True
+        self._menu_style_cache: Optional[Tuple[tuple, str]] = None
+
+        # 截图前等待窗口隐藏的延迟（粗精度定时器；
+        # QTimer.singleShot 在间隔较短时使用精确定时器）
+        self._capture_delay_timer = QTimer(self)
+        self._capture_delay_timer.setSingleShot(True)
+        self._capture_delay_timer.setTimerType(Qt.TimerType.CoarseTimer)
+        self._capture_delay_timer.setInterval(100)
+        self._capture_delay_timer.timeout.connect(self._run_delayed_capture)
+        self._delayed_capture = None
+        # 截图相关对象首次使用时创建，之后复用
+        self._screen_capture_service: Optional[ScreenCaptureService] = None
+        self._region_capture_cls = None
 
         # 自定义头像
         self._custom_avatar: Optional[QPixmap] = None
         self._avatar_path = ""
+        self._avatar_key = ""
+
+        # 绘制缓存：各状态的基础颜色、状态点颜色（主题颜色变化时重建）和头像裁剪路径
+        self._state_colors: Dict[FloatingBallState, QColor] = {}
+        self._state_status_colors: Dict[FloatingBallState, QColor] = {}
+        self._state_colors_key: Optional[tuple] = None
+        self._avatar_clip_path = QPainterPath()
+        self._avatar_clip_key: Optional[tuple] = None
+        # 外发光光晕预渲染缓存，键为 (基础颜色, 半径)，主题变化时清空
+        self._glow_pixmaps: Dict[tuple, QPixmap] = {}
 
         # 加载头像
         if hasattr(self.config, "appearance"):
@@ -1879,7 +2259,12 @@ class FloatingBallWindow(QWidget):
                 self._load_avatar(appearance["avatar_path"])
 
         # 精简版对话窗口
+        # 其可见性通过事件过滤器同步到 _compact_visible，拖拽时无需查询 Qt
+        self._compact_visible = False
+        # 精简窗口尺寸缓存 (宽, 高)，窗口大小改变时失效
+        self._compact_size: Optional[Tuple[int, int]] = None
         self._compact_window = CompactChatWindow(config=self.config)
+        self._compact_window.installEventFilter(self)
         self._compact_window.message_sent.connect(self.message_sent)
         self._compact_window.image_sent.connect(self.image_sent)
         self._compact_window.window_moved.connect(self._on_compact_window_moved)
@@ -1954,14 +2339,23 @@ class FloatingBallWindow(QWidget):
         self._breath_timer = QTimer(self)
         self._breath_timer.timeout.connect(self._update_breathing)
         self._breath_phase = 0.0
-        self._breath_timer.start(30)  # ~33 FPS
+        # 定时器仅在窗口可见且有动画时运行（见 _sync_breath_timer）
+        self._breath_interval = 30  # ~33 FPS
 
         # 优化刷新：记录上次需要刷新的状态，避免无意义的 update
         self._needs_update = True
+        # 上次绘制时的发光强度，变化不明显时跳过重绘
+        self._last_painted_glow = -1.0
 
         # 悬停状态
         self._hovered = False
 
+        # 默认位置缓存 (窗口尺寸, 位置)，主屏幕可用区域变化时失效
+        self._default_pos: Optional[Tuple[QSize, QPoint]] = None
+        screen = QApplication.primaryScreen()
+        if screen:
+            screen.availableGeometryChanged.connect(self._invalidate_default_position)
+
         # 初始位置
         self._move_to_default_position()
 
@@ -1986,11 +2380,25 @@ class FloatingBallWindow(QWidget):
 
     def _on_theme_changed(self, theme: Theme):
         """主题变化"""
+        self._glow_pixmaps.clear()
+        # 菜单样式和图标颜色依赖主题，下次打开时重新应用
+        self._menu_theme_dirty = True
         self.update()
 
     def _load_avatar(self, avatar_path: str = ""):
         """加载自定义头像图片"""
+        avatar_key = (
+            CompactChatWindow._avatar_cache_key(avatar_path) if avatar_path else ""
+        )
+        # 同一文件且未修改时无需重新解码和缩放
+        if (
+            self._custom_avatar is not None
+            and avatar_path == self._avatar_path
+            and avatar_key == self._avatar_key
+        ):
+            return
         self._avatar_path = avatar_path
+        self._avatar_key = avatar_key
         if avatar_path and os.path.exists(avatar_path):
             pixmap = QPixmap(avatar_path)
             if not pixmap.isNull():
@@ -2030,8 +2438,27 @@ class FloatingBallWindow(QWidget):
         """添加用户消息（传递给精简窗口）"""
         self._compact_window.add_user_message(text, image_path)
 
+    def _sync_breath_timer(self):
+        """根据可见性和动画状态启停呼吸灯定时器"""
+        active = self.isVisible() and (self._breathing or self._has_unread)
+        if active and not self._breath_timer.isActive():
+            self._breath_timer.start(self._breath_interval)
+        elif not active and self._breath_timer.isActive():
+            self._breath_timer.stop()
+
+    def _schedule_update(self):
+        """请求重绘：呼吸灯定时器运行时并入下一帧，否则立即 update"""
+        if self._breath_timer.isActive():
+            self._needs_update = True
+        else:
+            self.update()
+
     def _update_breathing(self):
         """更新呼吸灯效果"""
+        if not self.isVisible():
+            self._breath_timer.stop()
+            return
+
         should_update = False
 
         if self._breathing:
@@ -2039,7 +2466,9 @@ class FloatingBallWindow(QWidget):
             if self._breath_phase > 2 * math.pi:
                 self._breath_phase -= 2 * math.pi
             self._glow_intensity = (math.sin(self._breath_phase) + 1) / 2 * 0.4 + 0.3
-            should_update = True
+            # 发光强度变化不明显时不重绘
+            if abs(self._glow_intensity - self._last_painted_glow) > 0.02:
+                should_update = True
 
         # 未读消息脉冲动画（更快的频率）
         if self._has_unread:
@@ -2048,31 +2477,33 @@ class FloatingBallWindow(QWidget):
                 self._pulse_phase -= 2 * math.pi
             should_update = True
 
-        # 如果状态不是 NORMAL，也需要刷新（可能有其他动画效果）
-        if (
-            self._state != FloatingBallState.NORMAL
-            and self._state != FloatingBallState.DISCONNECTED
-        ):
-            should_update = True
-
         # 只有在需要时才调用 update，减少 CPU 占用和潜在的闪烁
         if should_update or self._needs_update:
             self.update()
             self._needs_update = False
 
+    def _invalidate_default_position(self, *args):
+        """主屏幕可用区域变化时丢弃缓存的默认位置"""
+        self._default_pos = None
+
     def _move_to_default_position(self):
-        """移动到默认位置"""
-        screen = QApplication.primaryScreen()
-        if screen:
+        """移动到默认位置（位置按窗口尺寸缓存，不重复查询屏幕几何）"""
+        size = self.size()
+        if self._default_pos is None or self._default_pos[0] != size:
+            screen = QApplication.primaryScreen()
+            if not screen:
+                return
             geometry = screen.availableGeometry()
-            x = geometry.right() - self.width() - 30
-            y = geometry.center().y() - self.height() // 2
-            self.move(x, y)
+            x = geometry.right() - size.width() - 30
+            y = geometry.center().y() - size.height() // 2
+            self._default_pos = (size, QPoint(x, y))
+        self.move(self._default_pos[1])
 
     def paintEvent(self, event):
         """绘制悬浮球"""
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self._last_painted_glow = self._glow_intensity
 
         colors = (
             theme_manager.get_current_colors()
@@ -2086,21 +2517,12 @@ class FloatingBallWindow(QWidget):
         radius = current_size // 2
 
         # 根据状态确定基础颜色
+        self._refresh_state_colors(colors)
+        base_color = self._state_colors[self._state]
         if self._state == FloatingBallState.DISCONNECTED:
-            base_color = QColor(colors.text_secondary)
-            glow_color = QColor(colors.text_secondary)
             # 在断开连接状态下强制刷新以确保灰色显示
             if not self._breathing:
                 self._needs_update = True
-        elif self._state == FloatingBallState.BUSY:
-            base_color = QColor(colors.warning)
-            glow_color = QColor(colors.warning)
-        elif self._state == FloatingBallState.PROCESSING:
-            base_color = QColor(colors.primary)
-            glow_color = QColor(colors.primary)
-        else:  # NORMAL
-            base_color = QColor(colors.primary)
-            glow_color = QColor(colors.primary)
 
         # 1. 绘制外发光
         glow_intensity = self._glow_intensity
@@ -2108,23 +2530,15 @@ class FloatingBallWindow(QWidget):
             # 处理中状态呼吸更快更明显
             glow_intensity = self._glow_intensity * 1.5
 
-        glow_color.setAlphaF(min(1.0, glow_intensity * (0.8 if self._hovered else 0.5)))
-
-        for i in range(10, 0, -2):
-            glow = QRadialGradient(center_x, center_y, radius + i)
-            glow_c = QColor(glow_color)
-            glow_c.setAlphaF(glow_color.alphaF() * (1 - i / 12))
-            glow.setColorAt(0.7, glow_c)
-            glow.setColorAt(1.0, Qt.GlobalColor.transparent)
-
-            painter.setBrush(QBrush(glow))
-            painter.setPen(Qt.PenStyle.NoPen)
-            painter.drawEllipse(
-                int(center_x - radius - i),
-                int(center_y - radius - i),
-                int((radius + i) * 2),
-                int((radius + i) * 2),
-            )
+        # 光晕按完整不透明度预渲染，每帧只通过画笔透明度调节呼吸效果
+        glow_pixmap = self._glow_pixmap(base_color, radius)
+        painter.setOpacity(
+            base_color.alphaF()
+            * min(1.0, glow_intensity * (0.8 if self._hovered else 0.5))
+        )
+        half = int(glow_pixmap.deviceIndependentSize().width()) // 2
+        painter.drawPixmap(center_x - half, center_y - half, glow_pixmap)
+        painter.setOpacity(1.0)
 
         # 2. 绘制主圆形背景（带渐变）
         gradient = QRadialGradient(
@@ -2152,7 +2566,7 @@ class FloatingBallWindow(QWidget):
         highlight = QRadialGradient(
             center_x - radius * 0.2, center_y - radius * 0.3, radius * 0.6
         )
-        highlight.setColorAt(0, QColor(255, 255, 255, 80))
+        highlight.setColorAt(0, _BALL_HIGHLIGHT_COLOR)
         highlight.setColorAt(1, Qt.GlobalColor.transparent)
 
         painter.setBrush(QBrush(highlight))
@@ -2165,15 +2579,18 @@ class FloatingBallWindow(QWidget):
 
         # 4. 绘制头像或图标
         if self._custom_avatar and not self._custom_avatar.isNull():
-            # 创建圆形裁剪路径
-            path = QPainterPath()
-            path.addEllipse(
-                float(center_x - radius + 4),
-                float(center_y - radius + 4),
-                float((radius - 4) * 2),
-                float((radius - 4) * 2),
-            )
-            painter.setClipPath(path)
+            # 圆形裁剪路径（尺寸不变时复用）
+            clip_key = (center_x, center_y, radius)
+            if clip_key != self._avatar_clip_key:
+                self._avatar_clip_path = QPainterPath()
+                self._avatar_clip_path.addEllipse(
+                    float(center_x - radius + 4),
+                    float(center_y - radius + 4),
+                    float((radius - 4) * 2),
+                    float((radius - 4) * 2),
+                )
+                self._avatar_clip_key = clip_key
+            painter.setClipPath(self._avatar_clip_path)
 
             # 绘制头像
             avatar_size = (radius - 4) * 2
@@ -2188,44 +2605,18 @@ class FloatingBallWindow(QWidget):
 
             # 如果是断开连接，添加灰色遮罩
             if self._state == FloatingBallState.DISCONNECTED:
-                painter.setBrush(QColor(0, 0, 0, 100))
+                painter.setBrush(_BALL_DISCONNECTED_MASK)
                 painter.drawEllipse(
                     int(center_x - radius + 4),
                     int(center_y - radius + 4),
                     int((radius - 4) * 2),
                     int((radius - 4) * 2),
                 )
-        else:
-            # 绘制默认SVG图标
-            # 根据状态选择图标
-            icon_name = "bot"
-            if self._state == FloatingBallState.DISCONNECTED:
-                icon_name = "zap-off"
-            elif self._state == FloatingBallState.BUSY:
-                icon_name = "message-square"
-            elif self._state == FloatingBallState.PROCESSING:
-                icon_name = "refresh-cw"
-
-            # 获取白色图标（确保在彩色背景上清晰可见）
-            icon_size = int(radius * 1.2)  # 图标大小约为半径的1.2倍
-            icon_pixmap = icon_manager.get_pixmap(icon_name, "#FFFFFF", icon_size)
 
-            # 居中绘制图标
-            icon_x = center_x - icon_size // 2
-            icon_y = center_y - icon_size // 2
-            painter.drawPixmap(int(icon_x), int(icon_y), icon_pixmap)
-
-            # 绘制状态小红点 (如果不是正常状态且有自定义头像时)
-            if self._state != FloatingBallState.NORMAL and self._custom_avatar:
+            # 绘制状态小圆点（头像遮住了状态图标，非正常状态时在右下角提示）
+            status_color = self._state_status_colors.get(self._state)
+            if status_color is not None:
                 status_radius = 6
-                status_color = Qt.GlobalColor.red
-                if self._state == FloatingBallState.BUSY:
-                    status_color = colors.warning
-                elif self._state == FloatingBallState.PROCESSING:
-                    status_color = colors.primary
-                elif self._state == FloatingBallState.DISCONNECTED:
-                    status_color = colors.text_secondary
-
                 painter.setBrush(status_color)
                 painter.setPen(Qt.PenStyle.NoPen)
                 # 右下角
@@ -2234,6 +2625,18 @@ class FloatingBallWindow(QWidget):
                 painter.drawEllipse(
                     QPoint(int(status_x), int(status_y)), status_radius, status_radius
                 )
+        else:
+            # 绘制默认SVG图标，根据状态选择图标
+            icon_name = _STATE_ICONS.get(self._state, "bot")
+
+            # 获取白色图标（确保在彩色背景上清晰可见）
+            icon_size = int(radius * 1.2)  # 图标大小约为半径的1.2倍
+            icon_pixmap = icon_manager.get_pixmap(icon_name, "#FFFFFF", icon_size)
+
+            # 居中绘制图标
+            icon_x = center_x - icon_size // 2
+            icon_y = center_y - icon_size // 2
+            painter.drawPixmap(int(icon_x), int(icon_y), icon_pixmap)
 
         # 6. 绘制未读消息指示器（红点 + 脉冲效果）
         if self._has_unread:
@@ -2247,10 +2650,11 @@ class FloatingBallWindow(QWidget):
 
             # 绘制外发光
             pulse_alpha = int(100 + 80 * math.sin(self._pulse_phase))
-            glow_color = QColor(255, 80, 80, pulse_alpha)
+            ring_color = QColor(_UNREAD_DOT_COLOR)
+            painter.setPen(Qt.PenStyle.NoPen)
             for i in range(4, 0, -1):
-                painter.setBrush(QColor(255, 80, 80, int(pulse_alpha * (1 - i / 5))))
-                painter.setPen(Qt.PenStyle.NoPen)
+                ring_color.setAlpha(int(pulse_alpha * (1 - i / 5)))
+                painter.setBrush(ring_color)
                 painter.drawEllipse(
                     QPoint(int(dot_x), int(dot_y)),
                     dot_radius + i * 2,
@@ -2258,15 +2662,13 @@ class FloatingBallWindow(QWidget):
                 )
 
             # 绘制红点主体
-            painter.setBrush(QColor(255, 80, 80))
-            painter.setPen(QPen(QColor(255, 255, 255, 200), 2))
+            painter.setBrush(_UNREAD_DOT_COLOR)
+            painter.setPen(_UNREAD_DOT_PEN)
             painter.drawEllipse(QPoint(int(dot_x), int(dot_y)), dot_radius, dot_radius)
 
         # 5. 绘制边框
         if self._hovered:
-            border_pen = QPen(QColor(255, 255, 255, 150))
-            border_pen.setWidth(2)
-            painter.setPen(border_pen)
+            painter.setPen(_HOVER_BORDER_PEN)
             painter.setBrush(Qt.BrushStyle.NoBrush)
             painter.drawEllipse(
                 int(center_x - radius + 1),
@@ -2275,6 +2677,71 @@ class FloatingBallWindow(QWidget):
                 int((radius - 1) * 2),
             )
 
+    def _glow_pixmap(self, base_color: QColor, radius: float) -> QPixmap:
+        """获取（必要时渲染）指定颜色和半径的外发光光晕"""
+        key = (base_color.rgb(), radius)
+        pixmap = self._glow_pixmaps.get(key)
+        if pixmap is not None:
+            return pixmap
+
+        # 缩放动画期间半径连续变化，限制缓存数量
+        if len(self._glow_pixmaps) >= 8:
+            self._glow_pixmaps.clear()
+
+        outer = _GLOW_RINGS[0][0]
+        size = int(radius + outer + 1) * 2
+        dpr = self.devicePixelRatioF()
+        pixmap = QPixmap(int(size * dpr), int(size * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+
+        center = size // 2
+        ring_color = QColor(base_color)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        for i, alpha_factor in _GLOW_RINGS:
+            glow = QRadialGradient(center, center, radius + i)
+            ring_color.setAlphaF(alpha_factor)
+            glow.setColorAt(0.7, ring_color)
+            glow.setColorAt(1.0, Qt.GlobalColor.transparent)
+
+            painter.setBrush(QBrush(glow))
+            painter.drawEllipse(
+                int(center - radius - i),
+                int(center - radius - i),
+                int((radius + i) * 2),
+                int((radius + i) * 2),
+            )
+        painter.end()
+
+        self._glow_pixmaps[key] = pixmap
+        return pixmap
+
+    def _refresh_state_colors(self, colors):
+        """按主题颜色重建各状态的基础颜色和状态点颜色，颜色未变化时直接复用"""
+        key = (colors.primary, colors.warning, colors.text_secondary)
+        if key == self._state_colors_key:
+            return
+        primary = QColor(colors.primary)
+        warning = QColor(colors.warning)
+        secondary = QColor(colors.text_secondary)
+        self._state_colors = {
+            FloatingBallState.NORMAL: primary,
+            FloatingBallState.BUSY: warning,
+            FloatingBallState.PROCESSING: primary,
+            FloatingBallState.DISCONNECTED: secondary,
+            FloatingBallState.UNREAD_MESSAGE: primary,
+        }
+        # 正常状态不绘制状态点
+        self._state_status_colors = {
+            FloatingBallState.BUSY: warning,
+            FloatingBallState.PROCESSING: primary,
+            FloatingBallState.DISCONNECTED: secondary,
+            FloatingBallState.UNREAD_MESSAGE: QColor(Qt.GlobalColor.red),
+        }
+        self._state_colors_key = key
+
     def enterEvent(self, event):
         """鼠标进入"""
         self._hovered = True
@@ -2290,8 +2757,20 @@ class FloatingBallWindow(QWidget):
         super().moveEvent(event)
         # 移动窗口跟随
         # 注意: 只有在非隐藏状态下才跟随，避免隐藏时位置错乱
-        if hasattr(self, "_compact_window") and self._compact_window.isVisible():
-             self._update_compact_window_position()
+        # 拖拽中由 _flush_drag_move 同时移动两个窗口，这里不再重复跟随
+        if self._compact_visible and not self._dragging:
+            self._update_compact_window_position()
+
+    def eventFilter(self, watched, event):
+        """同步精简窗口的显示/隐藏状态"""
+        # 最小化/还原产生的是系统（spontaneous）事件，此时 isVisible() 不变，忽略即可
+        if watched is self._compact_window and not event.spontaneous():
+            event_type = event.type()
+            if event_type == QEvent.Type.Show:
+                self._compact_visible = True
+            elif event_type == QEvent.Type.Hide:
+                self._compact_visible = False
+        return super().eventFilter(watched, event)
 
     def leaveEvent(self, event):
         """鼠标离开"""
@@ -2307,8 +2786,12 @@ class FloatingBallWindow(QWidget):
     def mousePressEvent(self, event: QMouseEvent):
         if event.button() == Qt.MouseButton.LeftButton:
             self._dragging = True
-            self._drag_start_pos = event.globalPosition().toPoint() - self.pos()
-            self._press_global_pos = event.globalPosition().toPoint()
+            press_pos = event.globalPosition().toPoint()
+            self._press_x = press_pos.x()
+            self._press_y = press_pos.y()
+            window_pos = self.pos()
+            self._drag_offset_x = self._press_x - window_pos.x()
+            self._drag_offset_y = self._press_y - window_pos.y()
             self._has_moved_significantly = False
             event.accept()
         elif event.button() == Qt.MouseButton.RightButton:
@@ -2318,33 +2801,52 @@ class FloatingBallWindow(QWidget):
     def mouseMoveEvent(self, event: QMouseEvent):
         if self._dragging:
             current_global_pos = event.globalPosition().toPoint()
+            gx = current_global_pos.x()
+            gy = current_global_pos.y()
 
-            # 检查是否移动超过阈值
+            # 检查是否移动超过阈值（整数平方距离；超过后本次拖拽不再检查）
             if not self._has_moved_significantly:
-                distance = (
-                    current_global_pos - self._press_global_pos
-                ).manhattanLength()
-                if distance > self._drag_threshold:
+                dx = gx - self._press_x
+                dy = gy - self._press_y
+                if dx * dx + dy * dy > self._drag_threshold_sq:
                     self._has_moved_significantly = True
 
-            # 移动窗口
-            new_pos = current_global_pos - self._drag_start_pos
-            self.move(new_pos)
-
-            # 移动窗口跟随
-            if not self._compact_window.isHidden():
-                self._update_compact_window_position()
+            # 移动窗口：节流周期内只记录位置，由定时器在周期结束时应用
+            self._pending_pos = (gx - self._drag_offset_x, gy - self._drag_offset_y)
+            if not self._drag_move_timer.isActive():
+                self._flush_drag_move()
             event.accept()
 
+    def _flush_drag_move(self):
+        """应用最近一次记录的拖拽位置，并开始下一个节流周期"""
+        if self._pending_pos is None:
+            return
+        new_x, new_y = self._pending_pos
+        self._pending_pos = None
+
+        # 先由新位置算出精简窗口的目标位置，再连续移动两个窗口
+        if self._compact_visible:
+            geom = self.geometry()
+            geom.moveTo(new_x, new_y)
+            x, y = self._compact_window_pos_for(geom)
+            self.move(new_x, new_y)
+            self._compact_window.move(x, y)
+        else:
+            self.move(new_x, new_y)
+        self._drag_move_timer.start()
+
     def mouseReleaseEvent(self, event: QMouseEvent):
         if event.button() == Qt.MouseButton.LeftButton:
+            # 应用节流中尚未执行的最后一次移动
+            self._drag_move_timer.stop()
+            self._flush_drag_move()
+            self._drag_move_timer.stop()
             self._dragging = False
 
             # 判断是否是点击（没有显著移动）
-            if not getattr(self, "_has_moved_significantly", False):
-                from PySide6.QtCore import QDateTime
-
-                current_time = QDateTime.currentMSecsSinceEpoch()
+            if not self._has_moved_significantly:
+                # 单调时钟（毫秒），不受系统时间调整影响
+                current_time = time.monotonic_ns() // 1_000_000
 
                 # 检查是否是双击的第二次释放
                 time_since_last = current_time - self._last_release_time
@@ -2353,11 +2855,9 @@ class FloatingBallWindow(QWidget):
                     # 这是双击的第二次释放，双击已在 mouseDoubleClickEvent 中处理
                     # 停止可能存在的单击定时器
                     self._click_timer.stop()
-                    self._pending_click = False
                 else:
                     # 这是单击，或双击的第一次释放
-                    # 启动定时器等待可能的第二次点击
-                    self._pending_click = True
+                    # 启动（或重新开始）定时器等待可能的第二次点击
                     self._click_timer.start(self._double_click_interval)
 
                 self._last_release_time = current_time
@@ -2368,88 +2868,109 @@ class FloatingBallWindow(QWidget):
         if event.button() == Qt.MouseButton.LeftButton:
             # 停止单击定时器，防止单击也被触发
             self._click_timer.stop()
-            self._pending_click = False
 
             # 发射双击信号
             self.double_clicked.emit()
             event.accept()
 
     def _on_single_click(self):
-        if self._pending_click:
-            self._pending_click = False
-            self.clicked.emit()
+        # 只有未被双击或再次释放取消的定时器才会超时到这里
+        self.clicked.emit()
 
     def _show_context_menu(self, pos: QPoint):
         """右键菜单"""
+        self._ensure_context_menu().exec(pos)
+
+    def _ensure_context_menu(self) -> QMenu:
+        """获取右键菜单，首次调用时创建，主题变化后重新应用样式"""
+        if self._context_menu is None:
+            self._build_context_menu()
+        if self._menu_theme_dirty:
+            theme_names = theme_manager.get_theme_names()
+            if theme_names != self._theme_menu_names:
+                self._populate_theme_menu(theme_names)
+            self._apply_menu_theme()
+        return self._context_menu
+
+    def _populate_theme_menu(self, theme_names: list):
+        """重建主题子菜单的菜单项，子菜单本身保持复用"""
+        self._theme_menu.clear()
+        for theme_name, display_name in theme_names:
+            action = self._theme_menu.addAction(display_name)
+            action.triggered.connect(partial(self._switch_theme_and_save, theme_name))
+        self._theme_menu_names = theme_names
+
+    def _build_context_menu(self):
+        """创建右键菜单的结构和信号连接（样式与图标由 _apply_menu_theme 设置）"""
         menu = QMenu(self)
-
-        # 应用主题样式
-        c = (
-            theme_manager.get_current_colors()
-        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
-        menu.setStyleSheet(f"""
-            QMenu {{
-                background-color: {c.bg_primary};
-                border: 1px solid {c.border_light};
-                border-radius: 8px;
-                padding: 6px;
-            }}
-            QMenu::item {{
-                padding: 8px 20px 8px 12px;
-                border-radius: 4px;
-                color: {c.text_primary};
-            }}
-            QMenu::item:selected {{
-                background-color: {c.bg_hover};
-            }}
-            QMenu::separator {{
-                height: 1px;
-                background-color: {c.border_light};
-                margin: 4px 8px;
-            }}
-        """)
+        icon_actions = []
+        # 菜单只创建一次，UniqueConnection 防止意外重复连接导致处理函数多次触发
+        unique = Qt.ConnectionType.UniqueConnection
 
         # 截图功能
         region_screenshot_action = menu.addAction("区域截图")
-        region_screenshot_action.setIcon(
-            icon_manager.get_icon("screenshot", c.text_primary, 16)
-        )
-        region_screenshot_action.triggered.connect(self._on_region_screenshot)
+        region_screenshot_action.triggered.connect(self._on_region_screenshot, unique)
+        icon_actions.append((region_screenshot_action, "screenshot", "text_primary"))
 
         full_screenshot_action = menu.addAction("全屏截图")
-        full_screenshot_action.setIcon(
-            icon_manager.get_icon("screenshot", c.text_primary, 16)
-        )
-        full_screenshot_action.triggered.connect(self._on_full_screenshot)
+        full_screenshot_action.triggered.connect(self._on_full_screenshot, unique)
+        icon_actions.append((full_screenshot_action, "screenshot", "text_primary"))
 
         menu.addSeparator()
 
         # 主题子菜单
+        # 子菜单项由 _populate_theme_menu 按主题列表填充
         theme_menu = menu.addMenu("切换主题")
-        theme_menu.setIcon(icon_manager.get_icon("theme", c.text_primary, 16))
-        theme_menu.setStyleSheet(menu.styleSheet())
-
-        for theme_name, display_name in theme_manager.get_theme_names():
-            action = theme_menu.addAction(display_name)
-            action.triggered.connect(
-                lambda checked, n=theme_name: self._switch_theme_and_save(n)
-            )
+        icon_actions.append((theme_menu.menuAction(), "theme", "text_primary"))
 
         menu.addSeparator()
 
         restart_action = menu.addAction("重启")
-        restart_action.setIcon(icon_manager.get_icon("restart", c.text_primary, 16))
-        restart_action.triggered.connect(self.restart_requested.emit)
+        restart_action.triggered.connect(self.restart_requested, unique)
+        icon_actions.append((restart_action, "restart", "text_primary"))
 
         settings_action = menu.addAction("设置")
-        settings_action.setIcon(icon_manager.get_icon("settings", c.text_primary, 16))
-        settings_action.triggered.connect(self.settings_requested.emit)
+        settings_action.triggered.connect(self.settings_requested, unique)
+        icon_actions.append((settings_action, "settings", "text_primary"))
 
         quit_action = menu.addAction("退出")
-        quit_action.setIcon(icon_manager.get_icon("exit", c.danger, 16))
-        quit_action.triggered.connect(self.quit_requested.emit)
+        quit_action.triggered.connect(self.quit_requested, unique)
+        icon_actions.append((quit_action, "exit", "danger"))
+
+        self._context_menu = menu
+        self._theme_menu = theme_menu
+        self._menu_icon_actions = icon_actions
+        self._menu_theme_dirty = True
+
+    def _menu_style_sheet(self, c) -> str:
+        """右键菜单样式表，颜色未变化时复用上次生成的字符串"""
+        key = (c.bg_primary, c.border_light, c.text_primary, c.bg_hover)
+        if self._menu_style_cache is not None and self._menu_style_cache[0] == key:
+            return self._menu_style_cache[1]
+        style = _MENU_STYLE_TEMPLATE.format_map(
+            {
+                "bg_primary": key[0],
+                "border_light": key[1],
+                "text_primary": key[2],
+                "bg_hover": key[3],
+            }
+        )
+        self._menu_style_cache = (key, style)
+        return style
 
-        menu.exec(pos)
+    def _apply_menu_theme(self):
+        """把当前主题的样式和图标颜色应用到右键菜单"""
+        c = (
+            theme_manager.get_current_colors()
+        )  # 使用 get_current_colors() 获取应用了自定义颜色的最终配置
+        style = self._menu_style_sheet(c)
+        # 样式表未变化时不触发重新解析
+        if self._context_menu.styleSheet() != style:
+            self._context_menu.setStyleSheet(style)
+            self._theme_menu.setStyleSheet(style)
+        for action, icon_name, color_attr in self._menu_icon_actions:
+            action.setIcon(icon_manager.get_icon(icon_name, getattr(c, color_attr), 16))
+        self._menu_theme_dirty = False
 
     def _switch_theme_and_save(self, theme_name: str):
         """切换主题并自动保存到配置"""
@@ -2467,19 +2988,33 @@ class FloatingBallWindow(QWidget):
         """区域截图"""
         try:
             # 记录聊天窗口是否可见，截图后恢复
-            self._chat_window_was_visible = self._compact_window.isVisible()
+            self._chat_window_was_visible = self._compact_visible
             self._compact_window.hide()
             self.hide()
-            QTimer.singleShot(100, self._start_region_capture)
+            self._schedule_capture(self._start_region_capture)
         except ImportError as e:
             print(f"区域截图功能不可用: {e}")
 
+    def _schedule_capture(self, callback):
+        """窗口隐藏后延迟执行截图回调"""
+        self._delayed_capture = callback
+        self._capture_delay_timer.start()
+
+    def _run_delayed_capture(self):
+        callback = self._delayed_capture
+        self._delayed_capture = None
+        if callback is not None:
+            callback()
+
     def _start_region_capture(self):
         """开始区域截图"""
         try:
-            from .screenshot_selector import RegionScreenshotCapture
+            if self._region_capture_cls is None:
+                from .screenshot_selector import RegionScreenshotCapture
 
-            self._capture = RegionScreenshotCapture()
+                self._region_capture_cls = RegionScreenshotCapture
+
+            self._capture = self._region_capture_cls()
             self._capture.capture_async(self._on_screenshot_complete)
         except Exception as e:
             print(f"启动区域截图失败: {e}")
@@ -2492,18 +3027,19 @@ class FloatingBallWindow(QWidget):
         """全屏截图"""
         try:
             # 记录聊天窗口是否可见，截图后恢复
-            self._chat_window_was_visible = self._compact_window.isVisible()
+            self._chat_window_was_visible = self._compact_visible
             self._compact_window.hide()
             self.hide()
-            QTimer.singleShot(100, self._do_full_screenshot)
+            self._schedule_capture(self._do_full_screenshot)
         except ImportError as e:
             print(f"截图功能不可用: {e}")
 
     def _do_full_screenshot(self):
         """执行全屏截图"""
         try:
-            service = ScreenCaptureService()
-            screenshot_path = service.capture_full_screen_to_file()
+            if self._screen_capture_service is None:
+                self._screen_capture_service = ScreenCaptureService()
+            screenshot_path = self._screen_capture_service.capture_full_screen_to_file()
 
             self.show()
             # 恢复聊天窗口显示状态
@@ -2540,7 +3076,7 @@ class FloatingBallWindow(QWidget):
 
     def toggle_input(self):
         """切换输入框显示/隐藏"""
-        if self._compact_window.isVisible():
+        if self._compact_visible:
             self._compact_window.hide()
         else:
             self.show_input()
@@ -2551,20 +3087,34 @@ class FloatingBallWindow(QWidget):
         self._compact_window.show()
         self._compact_window.activateWindow()
 
-    def _update_compact_window_position(self):
-        """更新精简窗口位置"""
-        w = self._compact_window.width()
-        h = self._compact_window.height()
+    def _compact_window_pos_for(self, geom) -> Tuple[int, int]:
+        """根据悬浮球几何区域计算精简窗口位置"""
+        size = self._compact_size
+        if size is None:
+            size = self._compact_size = (
+                self._compact_window.width(),
+                self._compact_window.height(),
+            )
+        w, h = size
+        ball_x = geom.x()
 
         # 默认显示在左侧
-        x = self.x() - w - 10
-        y = self.y() + (self.height() - h) // 2
+        x = ball_x - w - 10
+        y = geom.y() + (geom.height() - h) // 2
 
         # 如果左侧空间不足，显示在右侧
         if x < 0:
-            x = self.x() + self.width() + 10
+            x = ball_x + geom.width() + 10
+        return x, y
 
-        self._compact_window.move(x, y)
+    def _update_compact_window_position(self):
+        """更新精简窗口位置"""
+        x, y = self._compact_window_pos_for(self.geometry())
+
+        # 位置未变化（如拖拽时的重复事件）时不再调用 move
+        current = self._compact_window.pos()
+        if current.x() != x or current.y() != y:
+            self._compact_window.move(x, y)
 
     def _on_compact_window_moved(self, delta_x: int, delta_y: int):
         """当聊天窗口被拖动时，同步移动悬浮球"""
@@ -2574,6 +3124,7 @@ class FloatingBallWindow(QWidget):
 
     def _on_compact_window_resized(self):
         """当精简窗口大小改变时，调整悬浮球位置"""
+        self._compact_size = None
         # 判断当前悬浮球在窗口的哪一侧
         center_x_ball = self.x() + self.width() // 2
         center_x_win = self._compact_window.x() + self._compact_window.width() // 2
@@ -2610,9 +3161,10 @@ class FloatingBallWindow(QWidget):
     def set_breathing(self, enabled: bool):
         """设置呼吸灯效果"""
         self._breathing = enabled
+        self._sync_breath_timer()
         if not enabled:
             self._glow_intensity = 0.3
-            self.update()
+            self._schedule_update()
 
     def set_unread_message(self, has_unread: bool = True):
         """设置未读消息状态"""
@@ -2620,11 +3172,14 @@ class FloatingBallWindow(QWidget):
             self._has_unread = has_unread
             if has_unread:
                 self._pulse_phase = 0.0  # 重置脉冲相位
-            self.update()
+            self._sync_breath_timer()
+            self._schedule_update()
 
     def clear_unread_message(self):
         """清除未读消息状态"""
-        self.set_unread_message(False)
+        # 常见情况是本来就没有未读消息，只做一次属性判断
+        if self._has_unread:
+            self.set_unread_message(False)
 
     def has_unread_message(self) -> bool:
         """检查是否有未读消息"""
@@ -2665,7 +3220,13 @@ class FloatingBallWindow(QWidget):
     def showEvent(self, event):
         """窗口显示事件"""
         super().showEvent(event)
+        self._sync_breath_timer()
 
         # macOS: 设置窗口置顶层级
         if sys.platform == "darwin":
             QTimer.singleShot(50, lambda: _set_macos_window_level(self))
+
+    def hideEvent(self, event):
+        """窗口隐藏事件：停止呼吸灯动画"""
+        super().hideEvent(event)
+        self._breath_timer.stop()
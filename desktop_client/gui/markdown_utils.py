@@ -4,7 +4,11 @@ Markdown 渲染工具
 """
 
 import os
+import re
 import base64
+import functools
+from typing import List
+
 import markdown
 from PySide6.QtWidgets import QTextBrowser
 from PySide6.QtGui import QDesktopServices, QPixmap
@@ -43,6 +47,8 @@ class MarkdownLabel(QTextBrowser):
 
         self._role = role
         self._original_text = ""  # 保存原始 Markdown 文本用于主题更新
+        self._rendered = False  # 是否已渲染过 _original_text
+        self._html = ""  # 当前显示的 HTML，主题更新后内容不变时不再重新设置
         self._adjusting_height = False  # 防止递归调用
 
         # 应用主题样式（设置默认文字颜色）
@@ -51,9 +57,14 @@ class MarkdownLabel(QTextBrowser):
         self.set_markdown(text)
 
     def set_markdown(self, text: str):
-        """设置 Markdown 文本"""
+        """设置 Markdown 文本（内容未变化时不重新设置 HTML）"""
+        if self._rendered and text == self._original_text:
+            return
         self._original_text = text  # 保存原始文本
+        self._rendered = True
+        # HTML 来自 MarkdownUtils.render 的全局缓存，所有标签共享
         html = MarkdownUtils.render(text, self._role)
+        self._html = html
         self.setHtml(html)
         # 延迟调整尺寸，确保布局完成后再计算
         # 使用更长的延迟确保 maximumWidth 已被设置
@@ -92,27 +103,36 @@ class MarkdownLabel(QTextBrowser):
             self._adjusting_height = False
 
     def update_theme(self):
-        """更新主题 - 重新渲染内容以应用新主题颜色"""
+        """更新主题 - 重新渲染内容以应用新主题颜色
+
+        Markdown 解析结果按块缓存，这里只重新套用主题样式；
+        样式和 HTML 都未变化的标签（如与本角色无关的颜色调整）不做任何处理。
+        """
         # 先更新组件的默认文字颜色样式
-        self._apply_theme_style()
+        style_changed = self._apply_theme_style()
 
         if self._original_text:
             html = MarkdownUtils.render(self._original_text, self._role)
-            self.setHtml(html)
-            # 强制刷新样式
-            self.style().unpolish(self)
-            self.style().polish(self)
-            self.update()
-            # 延迟调整尺寸以适应内容
-            QTimer.singleShot(0, self._adjust_size)
+            html_changed = html != self._html
+            if html_changed:
+                self._html = html
+                self.setHtml(html)
+            if style_changed or html_changed:
+                # 强制刷新样式
+                self.style().unpolish(self)
+                self.style().polish(self)
+                self.update()
+            if html_changed:
+                # 延迟调整尺寸以适应内容
+                QTimer.singleShot(0, self._adjust_size)
 
     def resizeEvent(self, event):
         """窗口大小改变时重新计算尺寸"""
         super().resizeEvent(event)
         # 不在 resizeEvent 中调用 _adjust_size，避免循环
 
-    def _apply_theme_style(self):
-        """应用主题样式，设置默认文字颜色
+    def _apply_theme_style(self) -> bool:
+        """应用主题样式，设置默认文字颜色，返回样式是否发生变化
 
         这是修复深色主题下文字颜色问题的关键：
         通过 Qt 样式表显式设置 QTextBrowser 的默认文字颜色，
@@ -129,13 +149,17 @@ class MarkdownLabel(QTextBrowser):
             text_color = c.bubble_ai_text
 
         # 设置样式表，确保默认文字颜色与主题一致
-        self.setStyleSheet(f"""
+        style = f"""
             QTextBrowser {{
                 color: {text_color};
                 background: transparent;
                 border: none;
             }}
-        """)
+        """
+        if style == self.styleSheet():
+            return False
+        self.setStyleSheet(style)
+        return True
 
     def loadResource(self, resource_type, name):
         """重写资源加载，缓存图片用于预览"""
@@ -255,22 +279,114 @@ class MarkdownLabel(QTextBrowser):
 
     def _show_image_preview(self, pixmap: QPixmap, image_path: str):
         """显示图片预览对话框"""
-        from .floating_ball import ImagePreviewDialog
+        from .chat_widgets import ImagePreviewDialog
+
+        ImagePreviewDialog.show_preview(pixmap, image_path)
+
 
-        # 使用顶层窗口作为父窗口，确保对话框正确显示
-        parent_window = self.window()
-        dialog = ImagePreviewDialog(pixmap, image_path, parent_window)
-        dialog.exec()
+# 代码块围栏（三个及以上的 ` 或 ~），第二组为围栏后的内容
+_FENCE_RE = re.compile(r"^\s{0,3}(`{3,}|~{3,})(.*)$")
+# 空行之后仍属于上一个块的行：缩进、列表项、引用、表格
+_CONTINUATION_RE = re.compile(r"^(\s+\S|[-*+]\s|\d+[.)]\s|>|\|)")
+# 引用式链接定义，会影响整篇文档，出现时不分块
+_REFERENCE_RE = re.compile(r"^\s{0,3}\[[^\]]+\]:", re.MULTILINE)
 
 
 class MarkdownUtils:
     """Markdown 工具类"""
 
     @staticmethod
+    def split_blocks(text: str) -> List[str]:
+        """按空行把 Markdown 切分为互不影响的块
+
+        代码块内部、列表/缩进/引用/表格的延续部分不会被切开。
+        流式响应时前面已完成的块内容不再变化，可以直接复用渲染结果。
+        """
+        if _REFERENCE_RE.search(text):
+            return [text]
+
+        blocks = []
+        current: List[str] = []
+        # 当前打开的围栏标记，空字符串表示不在代码块内
+        fence = ""
+        blank_seen = False
+        for line in text.split("\n"):
+            if not line.strip():
+                current.append(line)
+                blank_seen = not fence
+                continue
+            if blank_seen and not _CONTINUATION_RE.match(line):
+                block = "\n".join(current).strip("\n")
+                if block:
+                    blocks.append(block)
+                current = []
+            blank_seen = False
+            match = _FENCE_RE.match(line)
+            if match:
+                marker, rest = match.groups()
+                if not fence:
+                    fence = marker
+                elif (marker[0] == fence[0] and len(marker) >= len(fence)
+                        and not rest.strip()):
+                    # 只有同种字符、长度不短于开启标记的纯围栏行才能关闭代码块
+                    fence = ""
+            current.append(line)
+
+        block = "\n".join(current).strip("\n")
+        if block:
+            blocks.append(block)
+        return blocks
+
+    @staticmethod
+    @functools.lru_cache(maxsize=2048)
+    def _render_block(block: str, pygments_style: str) -> str:
+        """把单个 Markdown 块转换为 HTML（不含主题样式，按块缓存）"""
+        configs = {
+            "codehilite": {
+                "noclasses": True,
+                "pygments_style": pygments_style,
+                "use_pygments": True,
+                "css_class": "codehilite",
+            }
+        }
+
+        try:
+            html_content = markdown.markdown(
+                block,
+                extensions=[
+                    "fenced_code",
+                    "codehilite",
+                    "tables",
+                    "nl2br",
+                    "sane_lists",
+                ],
+                extension_configs=configs,
+            )
+
+            # 后处理：给图片添加链接，以便支持点击预览
+            # 查找 <img src="..."> 并替换为 <a href="..."><img src="..."></a>
+            def replace_img(match):
+                img_tag = match.group(0)
+                src_match = re.search(r'src="([^"]+)"', img_tag)
+                if src_match:
+                    src = src_match.group(1)
+                    return f'<a href="{src}">{img_tag}</a>'
+                return img_tag
+
+            return re.sub(r"<img[^>]+>", replace_img, html_content)
+
+        except Exception:
+            return f"<p>{block}</p>"
+
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
     def render(text: str, role: str = "assistant") -> str:
         """
         将 Markdown 文本转换为适合 Qt QTextBrowser 显示的 HTML
 
+        结果按 (文本, 角色) 缓存，重新加载历史时相同内容不再重复解析；
+        HTML 中包含主题颜色，主题或自定义颜色变化时缓存会被清空。
+
         Args:
             text: Markdown 文本
             role: 消息角色 ("user" 或 "assistant")
@@ -306,50 +422,16 @@ class MarkdownUtils:
                 border_color = c.border_base
                 blockquote_bg = "rgba(0, 0, 0, 0.05)"  # 半透明黑
 
-        # 配置 Markdown 扩展
+        # 代码高亮配色
         pygments_style = (
             "monokai" if theme.type == ThemeType.DARK and role != "user" else "default"
         )
 
-        configs = {
-            "codehilite": {
-                "noclasses": True,
-                "pygments_style": pygments_style,
-                "use_pygments": True,
-                "css_class": "codehilite",
-            }
-        }
-
-        try:
-            # 预处理：保护一些不需要渲染的内容
-            html_content = markdown.markdown(
-                text,
-                extensions=[
-                    "fenced_code",
-                    "codehilite",
-                    "tables",
-                    "nl2br",
-                    "sane_lists",
-                ],
-                extension_configs=configs,
-            )
-
-            # 后处理：给图片添加链接，以便支持点击预览
-            # 查找 <img src="..."> 并替换为 <a href="..."><img src="..."></a>
-            import re
-
-            def replace_img(match):
-                img_tag = match.group(0)
-                src_match = re.search(r'src="([^"]+)"', img_tag)
-                if src_match:
-                    src = src_match.group(1)
-                    return f'<a href="{src}">{img_tag}</a>'
-                return img_tag
-
-            html_content = re.sub(r"<img[^>]+>", replace_img, html_content)
-
-        except Exception:
-            return f"<p>{text}</p>"
+        # 逐块渲染：流式响应中已完成的块命中缓存，只解析仍在增长的最后一块
+        html_content = "\n".join(
+            MarkdownUtils._render_block(block, pygments_style)
+            for block in MarkdownUtils.split_blocks(text)
+        )
 
         # 构建 CSS 样式
         style = f"""
@@ -443,3 +525,8 @@ class MarkdownUtils:
         """
 
         return f"{style}<div>{html_content}</div>"
+
+
+# 渲染结果依赖主题颜色，主题变化时清空缓存
+# （本模块先于各窗口导入，回调先于窗口的主题回调执行）
+theme_manager.register_callback(lambda _theme: MarkdownUtils.render.cache_clear())
@@ -13,7 +13,7 @@ import os
 import uuid
 import time
 from dataclasses import dataclass, field, asdict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from pathlib import Path
 import logging
 
@@ -40,6 +40,30 @@ class ChatMessage:
         if self.timestamp == 0.0:
             self.timestamp = time.time()
 
+    @property
+    def audio_path(self) -> str:
+        """语音消息的音频路径（content 格式为 "audio_path|duration"）"""
+        return self._parse_audio_content()[0]
+
+    @property
+    def audio_duration(self) -> float:
+        """语音消息的时长（秒），未记录时为 0"""
+        return self._parse_audio_content()[1]
+
+    def _parse_audio_content(self) -> Tuple[str, float]:
+        """解析语音消息内容，结果按 content 缓存在实例上"""
+        cached = getattr(self, "_audio_cache", None)
+        if cached is None or cached[0] != self.content:
+            path_text, _, rest = self.content.partition("|")
+            audio_path = path_text.strip()
+            try:
+                duration = float(rest.partition("|")[0]) if rest else 0.0
+            except ValueError:
+                duration = 0.0
+            cached = (self.content, audio_path, duration)
+            self._audio_cache = cached
+        return cached[1], cached[2]
+
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         return asdict(self)
@@ -554,6 +554,35 @@ class TestMessageBridgeSSEEventHandling:
             assert received_messages[0].msg_type == "saved"
             assert received_messages[0].metadata["message_id"] == "msg_123"
 
+    @pytest.mark.unit
+    def test_handle_event_with_base_metadata(
+        self, mock_qt_app, sample_config: ClientConfig
+    ):
+        """测试请求级基础元数据合并到事件元数据"""
+        with patch("desktop_client.bridge.AstrBotApiClient"):
+            bridge = MessageBridge(sample_config)
+
+            received_messages = []
+            bridge.message_received.connect(lambda msg: received_messages.append(msg))
+
+            base_metadata = {"request_id": "req_abc"}
+            bridge._handle_sse_event(
+                SSEEvent(event_type="image", data="[IMAGE]a.png"),
+                "session_123",
+                base_metadata,
+            )
+            bridge._handle_sse_event(
+                SSEEvent(event_type="end", data=""), "session_123", base_metadata
+            )
+
+            assert received_messages[0].metadata == {
+                "request_id": "req_abc",
+                "filename": "a.png",
+            }
+            assert received_messages[1].metadata == {"request_id": "req_abc"}
+            # 基础元数据本身不应被修改
+            assert base_metadata == {"request_id": "req_abc"}
+
 
 class TestMessageBridgeServerConfig:
     """消息桥接器服务器配置测试"""
@@ -598,6 +627,32 @@ class TestMessageBridgeServerConfig:
             # 其他字段不变
             assert bridge.config.server.username == original_username
 
+    @pytest.mark.unit
+    def test_update_server_config_unchanged_keeps_token(
+        self, mock_qt_app, sample_config: ClientConfig
+    ):
+        """测试凭据未变化时保留 token"""
+        with patch("desktop_client.bridge.AstrBotApiClient") as mock_client_cls:
+            mock_client = MagicMock()
+            mock_client.server_url = sample_config.server.url
+            mock_client.username = sample_config.server.username
+            mock_client.password = sample_config.server.password
+            mock_client.token = "test_token_12345"
+            mock_client.state = ConnectionState.CONNECTED
+            mock_client_cls.return_value = mock_client
+
+            bridge = MessageBridge(sample_config)
+
+            bridge.update_server_config(
+                url=sample_config.server.url,
+                username=sample_config.server.username,
+                password=sample_config.server.password,
+            )
+
+            assert bridge.config.server.token == "test_token_12345"
+            assert mock_client.token == "test_token_12345"
+            assert mock_client.state == ConnectionState.CONNECTED
+
 
 class TestMessageBridgeAsync:
     """消息桥接器异步方法测试"""
@@ -0,0 +1,375 @@
+"""
+依赖检查模块单元测试
+
+测试 dependency_checker 的功能：
+- 包名规范化
+- 缺失依赖检测
+- 检查结果缓存
+- 批量安装与逐个回退
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+# 确保可以导入 desktop_client
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from desktop_client import dependency_checker
+from desktop_client.dependency_checker import (
+    CORE_DEPENDENCIES,
+    Dependency,
+    _normalize_name,
+    get_missing_dependencies,
+    install_missing_dependencies,
+    install_missing_dependencies_async,
+)
+
+
+class TestNormalizeName:
+    """包名规范化测试"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "requirement, expected",
+        [
+            ("PySide6>=6.5.0", "pyside6"),
+            ("httpx[http2]>=0.24.0", "httpx"),
+            ("python_dateutil", "python-dateutil"),
+            ("six>=1.5 (from python-dateutil>=2.8.0)", "six"),
+            ("pyobjc-framework-Cocoa>=9.0", "pyobjc-framework-cocoa"),
+        ],
+    )
+    def test_normalize(self, requirement: str, expected: str):
+        """测试去除版本约束和 extras"""
+        assert _normalize_name(requirement) == expected
+
+
+class TestGetMissingDependencies:
+    """缺失依赖检测测试"""
+
+    @pytest.mark.unit
+    def test_detects_missing(self):
+        """测试通过发行包索引和 find_spec 回退检测缺失依赖"""
+        deps = [
+            Dependency("pytest", "pytest>=7.0.0", True),
+            Dependency("json", "not-a-real-dist-json", True),  # 标准库，依靠 find_spec 回退
+            Dependency("astrbot_missing_mod", "astrbot-missing-dist>=1.0", False),
+        ]
+        with patch.object(dependency_checker, "CORE_DEPENDENCIES", deps), patch.object(
+            dependency_checker.sys, "platform", "linux"
+        ):
+            missing = get_missing_dependencies()
+
+        assert missing == [
+            Dependency("astrbot_missing_mod", "astrbot-missing-dist>=1.0", False)
+        ]
+
+
+class TestFrozenModules:
+    """打包环境模块检测测试"""
+
+    @pytest.mark.unit
+    def test_frozen_bundle_scans_once(self, tmp_path):
+        """测试打包环境中通过目录扫描识别模块"""
+        (tmp_path / "PySide6").mkdir()
+        (tmp_path / "psutil.pyd").touch()
+        with patch.object(dependency_checker, "_FROZEN_MODULES", None), patch.object(
+            dependency_checker.sys, "frozen", True, create=True
+        ), patch.object(
+            dependency_checker.sys, "_MEIPASS", str(tmp_path), create=True
+        ), patch.object(
+            dependency_checker.importlib.util, "find_spec", return_value=None
+        ) as find_spec:
+            assert dependency_checker.check_module_installed("PySide6") is True
+            assert dependency_checker.check_module_installed("psutil") is True
+            assert dependency_checker.check_module_installed("mss") is False
+
+        find_spec.assert_called_once_with("mss")
+
+
+class TestDependencyCache:
+    """依赖检查缓存测试"""
+
+    @pytest.mark.unit
+    def test_cache_roundtrip(self, tmp_path: Path):
+        """测试写入缓存后有效，site-packages 更新后失效"""
+        site_dir = tmp_path / "site-packages"
+        site_dir.mkdir()
+        os.utime(site_dir, (1, 1))
+
+        with patch.object(dependency_checker, "CACHE_DIR", tmp_path / "cache"), patch.object(
+            dependency_checker, "_site_packages_dirs", return_value=[str(site_dir)]
+        ):
+            assert dependency_checker.is_dependency_cache_valid() is False
+
+            dependency_checker.write_dependency_cache()
+            assert dependency_checker.is_dependency_cache_valid() is True
+
+            # 模拟安装/卸载包导致目录更新
+            future = dependency_checker._dependency_cache_file().stat().st_mtime + 10
+            os.utime(site_dir, (future, future))
+            assert dependency_checker.is_dependency_cache_valid() is False
+
+
+class TestDependencyLock:
+    """依赖锁文件测试"""
+
+    @pytest.mark.unit
+    def test_lock_roundtrip(self, tmp_path):
+        """测试生成的锁文件在同一环境中有效"""
+        lock = tmp_path / "deps.lock.json"
+        with patch.object(dependency_checker, "get_missing_dependencies", return_value=[]):
+            assert dependency_checker.write_dependency_lock(lock) is True
+
+        assert dependency_checker.is_dependency_lock_valid(lock) is True
+
+    @pytest.mark.unit
+    def test_lock_python_mismatch(self, tmp_path):
+        """测试 Python 版本不一致时锁文件无效"""
+        lock = tmp_path / "deps.lock.json"
+        modules = [d.module_name for d in dependency_checker._platform_dependencies()]
+        lock.write_text(json.dumps({"python": "2.7.18", "deps": modules}))
+
+        assert dependency_checker.is_dependency_lock_valid(lock) is False
+
+    @pytest.mark.unit
+    def test_lock_missing_module(self, tmp_path):
+        """测试锁文件未覆盖全部依赖时无效"""
+        lock = tmp_path / "deps.lock.json"
+        missing = [CORE_DEPENDENCIES[0]]
+        with patch.object(
+            dependency_checker, "get_missing_dependencies", return_value=missing
+        ):
+            assert dependency_checker.write_dependency_lock(lock) is False
+
+        assert dependency_checker.is_dependency_lock_valid(lock) is False
+
+    @pytest.mark.unit
+    def test_lock_ignored_when_not_frozen(self):
+        """测试非打包环境中忽略锁文件"""
+        missing = [Dependency("mss", "mss>=9.0.0", True)]
+        with patch.object(
+            dependency_checker, "is_dependency_lock_valid", return_value=True
+        ), patch.object(
+            dependency_checker, "is_dependency_cache_valid", return_value=False
+        ), patch.object(
+            dependency_checker, "get_missing_dependencies", return_value=missing
+        ):
+            assert dependency_checker.check_dependencies() == missing
+
+    @pytest.mark.unit
+    def test_missing_lock_file(self, tmp_path):
+        """测试锁文件不存在时无效"""
+        assert dependency_checker.is_dependency_lock_valid(tmp_path / "none") is False
+
+
+class TestPartitionDependencies:
+    """依赖分组测试"""
+
+    @pytest.mark.unit
+    def test_partition(self):
+        """测试必需依赖排在可选依赖之前"""
+        optional = Dependency("pynput", "pynput>=1.7.0", False)
+        required = Dependency("mss", "mss>=9.0.0", True)
+
+        assert dependency_checker.partition_dependencies([optional, required]) == (
+            [required],
+            [optional],
+            [required, optional],
+        )
+
+
+class TestCheckAndInstallDependencies:
+    """检查与安装入口测试"""
+
+    @pytest.mark.unit
+    def test_optional_only_installs_in_background(self):
+        """测试只缺可选依赖时不阻塞启动"""
+        missing = [Dependency("pynput", "pynput>=1.7.0", False)]
+        with patch.object(
+            dependency_checker, "check_dependencies", return_value=missing
+        ), patch.object(
+            dependency_checker, "start_pip_upgrade", return_value=None
+        ) as upgrade, patch.object(
+            dependency_checker, "install_in_background"
+        ) as background:
+            success, message = dependency_checker.check_and_install_dependencies(
+                show_gui=False
+            )
+
+        assert success is True
+        assert "后台" in message
+        upgrade.assert_called_once_with()
+        background.assert_called_once_with(missing, None)
+
+    @pytest.mark.unit
+    def test_nothing_missing_skips_pip_upgrade(self):
+        """测试依赖齐全时不升级 pip"""
+        with patch.object(
+            dependency_checker, "check_dependencies", return_value=[]
+        ), patch.object(dependency_checker, "start_pip_upgrade") as upgrade:
+            success, _ = dependency_checker.check_and_install_dependencies()
+
+        assert success is True
+        upgrade.assert_not_called()
+
+    @pytest.mark.unit
+    def test_no_display_falls_back_to_cli(self):
+        """测试没有可用显示时不创建 Qt 对话框，直接走命令行安装"""
+        missing = [Dependency("qasync", "qasync>=0.27.0", True)]
+        with patch.object(
+            dependency_checker, "check_dependencies", return_value=missing
+        ), patch.object(
+            dependency_checker, "start_pip_upgrade", return_value=None
+        ), patch.object(
+            dependency_checker, "has_display", return_value=False
+        ), patch.object(
+            dependency_checker, "_install_with_gui_qt"
+        ) as gui, patch.object(
+            dependency_checker, "_install_cli", return_value=(True, "ok")
+        ) as cli:
+            assert dependency_checker.check_and_install_dependencies() == (True, "ok")
+
+        gui.assert_not_called()
+        cli.assert_called_once()
+
+    @pytest.mark.gui
+    @pytest.mark.skipif(
+        not dependency_checker.has_display(), reason="需要可用的显示环境"
+    )
+    def test_qt_progress_dialog(self):
+        """测试 Qt 进度对话框在工作线程完成后返回结果"""
+        required = [Dependency("qasync", "qasync>=0.27.0", True)]
+
+        def fake_install(missing, progress_callback, pip_upgrade=None):
+            progress_callback(0, 1, "qasync>=0.27.0", "success")
+            return ["qasync>=0.27.0"], []
+
+        with patch.object(
+            dependency_checker, "install_missing_dependencies", side_effect=fake_install
+        ):
+            success, message = dependency_checker._install_with_gui_qt(
+                required, [], required
+            )
+
+        assert success is True
+        assert "成功安装 1" in message
+
+
+class TestInstallMissingDependencies:
+    """依赖安装流程测试"""
+
+    MISSING = [
+        Dependency("mss", "mss>=9.0.0", True),
+        Dependency("pynput", "pynput>=1.7.0", False),
+    ]
+
+    @pytest.mark.unit
+    def test_batch_success(self):
+        """测试并发下载后只调用一次 pip 离线安装"""
+        events = []
+        with patch.object(dependency_checker, "_run_pip", return_value=True) as run:
+            success, failed = install_missing_dependencies(
+                self.MISSING, lambda *args: events.append(args)
+            )
+
+        commands = [call.args[0][0] for call in run.call_args_list]
+        assert commands.count("download") == 2
+        assert commands.count("install") == 1
+        assert "--no-index" in run.call_args_list[-1].args[0]
+        assert success == ["mss>=9.0.0", "pynput>=1.7.0"]
+        assert failed == []
+        assert (1, 2, "pynput>=1.7.0", "success") in events
+
+    @pytest.mark.unit
+    def test_batch_failure_falls_back_per_package(self):
+        """测试批量安装失败后逐个重试以定位失败的包"""
+        with patch.object(
+            dependency_checker, "stage_packages", return_value=False
+        ), patch.object(
+            dependency_checker, "install_packages_batch", return_value=False
+        ), patch.object(
+            dependency_checker,
+            "install_package",
+            side_effect=lambda name, *args, **kwargs: name.startswith("mss"),
+        ):
+            success, failed = install_missing_dependencies(self.MISSING)
+
+        assert success == ["mss>=9.0.0"]
+        assert failed == ["pynput>=1.7.0"]
+
+
+class TestInstallMissingDependenciesAsync:
+    """依赖安装流程（asyncio 版本）测试"""
+
+    MISSING = TestInstallMissingDependencies.MISSING
+
+    @pytest.mark.unit
+    async def test_batch_success(self):
+        """测试并发下载后只调用一次 pip 离线安装"""
+        with patch.object(
+            dependency_checker, "_run_pip_async", new=AsyncMock(return_value=True)
+        ) as run:
+            success, failed = await install_missing_dependencies_async(self.MISSING)
+
+        commands = [call.args[0][0] for call in run.call_args_list]
+        assert commands.count("download") == 2
+        assert commands.count("install") == 1
+        assert "--no-index" in run.call_args_list[-1].args[0]
+        assert success == ["mss>=9.0.0", "pynput>=1.7.0"]
+        assert failed == []
+
+    @pytest.mark.unit
+    async def test_batch_failure_falls_back_per_package(self):
+        """测试批量安装失败后逐个重试以定位失败的包"""
+
+        async def fake_run(args, timeout=None):
+            if args[0] == "download":
+                return True
+            # 批量安装失败，只有单独安装 mss 成功
+            names = [arg for arg in args if arg.endswith(("9.0.0", "1.7.0"))]
+            return names == ["mss>=9.0.0"]
+
+        with patch.object(dependency_checker, "_run_pip_async", side_effect=fake_run):
+            success, failed = await install_missing_dependencies_async(self.MISSING)
+
+        assert success == ["mss>=9.0.0"]
+        assert failed == ["pynput>=1.7.0"]
+
+
+class TestInstallPackage:
+    """单个包安装测试"""
+
+    @pytest.mark.unit
+    def test_wheel_only_failure_retries_sdist_for_allowlisted(self):
+        """测试允许源码构建的包在 wheel 安装失败后重试"""
+        with patch.object(
+            dependency_checker, "_run_pip", side_effect=[False, True]
+        ) as run:
+            assert dependency_checker.install_package("pynput>=1.7.0") is True
+
+        assert "--only-binary=:all:" in run.call_args_list[0].args[0]
+        assert "--only-binary=:all:" not in run.call_args_list[1].args[0]
+
+    @pytest.mark.unit
+    def test_leaf_package_skips_dependency_resolution(self):
+        """测试没有运行时依赖的包使用 --no-deps 安装"""
+        with patch.object(dependency_checker, "_run_pip", return_value=True) as run:
+            dependency_checker.install_package("mss>=9.0.0")
+            dependency_checker.install_package("pydantic>=2.0.0")
+
+        assert "--no-deps" in run.call_args_list[0].args[0]
+        assert "--no-deps" not in run.call_args_list[1].args[0]
+
+    @pytest.mark.unit
+    def test_wheel_only_failure_no_retry(self):
+        """测试其他包 wheel 安装失败后直接返回失败"""
+        with patch.object(dependency_checker, "_run_pip", return_value=False) as run:
+            assert dependency_checker.install_package("mss>=9.0.0") is False
+
+        assert run.call_count == 1